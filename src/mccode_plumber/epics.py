@@ -1,11 +1,41 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-from p4p.nt import NTScalar
-from p4p.server import Server, StaticProvider
-from p4p.server.thread import SharedPV
 from pathlib import Path
-from typing import Union
+from typing import Callable, Union, TYPE_CHECKING
+
+# p4p takes a significant fraction of a second to import, so it is only imported
+# where needed. This keeps, e.g., mp-epics-strings --help and the conversion of
+# instrument parameters to strings, fast.
+if TYPE_CHECKING:
+    from p4p.nt import NTScalar
+    from p4p.server import Server
+    from p4p.server.thread import SharedPV
+
+# The NumPy dtype of the elements of numeric NTScalar array types, by type code
+ARRAY_DTYPES = {
+    'a?': 'bool', 'ab': 'int8', 'aB': 'uint8', 'ah': 'int16', 'aH': 'uint16', 'ai': 'int32', 'aI': 'uint32',
+    'al': 'int64', 'aL': 'uint64', 'af': 'float32', 'ad': 'float64',
+}
+
+
+def as_array(value, type_code: str):
+    """Convert a value to the NumPy array, or list of strings, held by an NTScalar array type
+
+    Strings are parsed as whitespace- or comma-separated elements, optionally
+    enclosed in square brackets, e.g., '[1,2,3]' or '1 2 3'. Array-like values
+    are converted without copying when they already have the right dtype.
+    """
+    from numpy import asarray
+    if isinstance(value, str):
+        value = value.translate(str.maketrans(',', ' ', '[]')).split()
+    if type_code not in ARRAY_DTYPES:
+        return [str(x) for x in value]
+    try:
+        return asarray(value, dtype=ARRAY_DTYPES[type_code])
+    except TypeError as e:
+        raise ValueError(f'Can not convert {value!r} to an {type_code} array') from e
+
 
 def instr_par_to_nt_primitive(parameters):
     from mccode_antlr.common.expression import DataType, ShapeType
@@ -21,12 +51,14 @@ def instr_par_to_nt_primitive(parameters):
         else:
             raise ValueError(f"Unknown parameter type {expr.data_type}")
         if expr.shape_type == ShapeType.vector:
-            t, d = 'a' + t, [d]
+            t, d = 'a' + t, as_array([d], 'a' + t)
         out.append((p.name, t, d))
     return out
 
 def instr_par_nt_to_strings(parameters):
-    return [f'{n}:{t}:{d}'.replace(' ','') for n, t, d in instr_par_to_nt_primitive(parameters)]
+    def fmt(d):
+        return f"[{','.join(str(x) for x in d)}]" if isinstance(d, list) or hasattr(d, 'dtype') else str(d)
+    return [f'{n}:{t}:{fmt(d)}'.replace(' ','') for n, t, d in instr_par_to_nt_primitive(parameters)]
 
 def strings_to_instr_par_nt(strings):
     out = []
@@ -40,24 +72,27 @@ def strings_to_instr_par_nt(strings):
         elif 's' in t:
             trans = str
         else:
-            ValueError(f"Unknown type in {string}")
+            raise ValueError(f"Unknown type in {string}")
         if t.startswith('a'):
-            d = [trans(x) for x in dstr.translate(str.maketrans(',',' ','[]')).split()]
+            d = as_array(dstr, t)
         else:
             d = trans(dstr)
         out.append((name, t, d))
     return out
 
 def convert_strings_to_nt(strings):
+    from p4p.nt import NTScalar
     return {n: NTScalar(t).wrap(d) for n, t, d in strings_to_instr_par_nt(strings)}
 
 def convert_instr_parameters_to_nt(parameters):
+    from p4p.nt import NTScalar
     out = {n: NTScalar(t).wrap(d) for n, t, d in instr_par_to_nt_primitive(parameters)}
     return out
 
 
 def parse_instr_nt_values(instr: Union[Path, str]):
     """Get the instrument parameters from an Instr a or a parseable Instr file and convert to NTScalar values"""
+    from p4p.nt import NTScalar
     from .mccode import get_mccode_instr_parameters
     nts = convert_instr_parameters_to_nt(get_mccode_instr_parameters(instr))
     if 'mcpl_filename' not in nts:
@@ -65,16 +100,24 @@ def parse_instr_nt_values(instr: Union[Path, str]):
     return nts
 
 
+# The name of the mailbox PV which updates many others at once, see GroupHandler
+GROUP_NAME = '_group'
+
+
+def _ensure_wrap(pv, type_code: str):
+    from p4p.nt import NTScalar
+    if pv.nt is None:
+        # Assume that this means wrap wasn't provided ...
+        pv.nt = NTScalar(type_code)
+        pv._wrap = pv.nt.wrap
+
+
 class MailboxHandler:
     @staticmethod
     def put(pv, op):
         from datetime import datetime, timezone
         val = op.value()
-
-        if pv.nt is None:
-            # Assume that this means wrap wasn't provided ...
-            pv.nt = NTScalar(val.type()['value'])
-            pv._wrap = pv.nt.wrap
+        _ensure_wrap(pv, val.type()['value'])
 
         # Notify any subscribers of the new value, adding the timestamp, so they know when it was set.
         pv.post(val, timestamp=datetime.now(timezone.utc).timestamp())
@@ -82,6 +125,122 @@ class MailboxHandler:
         op.done()
 
 
+class GroupHandler:
+    """Update many mailbox PVs from one PUT to a structure with a field per PV name
+
+    Every PV named by a field changed in the PUT is posted, in one pass, with a
+    single timestamp, so all values of one scan point share the same time.
+    """
+    def __init__(self, pvs: dict[str, SharedPV], types: dict):
+        self.pvs = pvs
+        self.types = types
+
+    def put(self, pv, op):
+        from datetime import datetime, timezone
+        from p4p import Value
+        val = op.value()
+        timestamp = datetime.now(timezone.utc).timestamp()
+        updates = {}
+        try:
+            for field in val.changedSet():
+                name = field.removeprefix('value.')
+                if name in self.pvs:
+                    # A posted Value must have the exact Type which the PV was opened with
+                    updates[name] = Value(self.types[name], {'value': val[field]})
+        except (TypeError, ValueError) as e:
+            # Post nothing, so the values of one scan point are updated together or not at all
+            op.done(error=str(e))
+            return
+        for name, value in updates.items():
+            _ensure_wrap(self.pvs[name], self.types[name]['value'])
+            self.pvs[name].post(value, timestamp=timestamp)
+        pv.post(val)
+        op.done()
+
+
+def group_pv(pvs: dict[str, SharedPV], values: dict[str, NTScalar]) -> SharedPV:
+    """Make the group-update PV for mailbox PVs and their initial values, keyed by name"""
+    from p4p import Type, Value
+    from p4p.server.thread import SharedPV
+    types = {name: value.type() for name, value in values.items()}
+    structure = Type([('value', ('S', None, [(name, t['value']) for name, t in types.items()]))])
+    return SharedPV(initial=Value(structure, {}), handler=GroupHandler(pvs, types))
+
+
+# The conversion for values of each field of each group-update PV address, discovered on first use
+_GROUP_CONVERTERS: dict[str, dict[str, Callable]] = {}
+
+
+def _type_code_converter(type_code: str) -> Callable:
+    """The conversion of a value to that held by a field with the p4p type code"""
+    from functools import partial
+    if type_code.startswith('a'):
+        return partial(as_array, type_code=type_code)
+    if type_code == 's':
+        return str
+    if type_code in 'fd':
+        return float
+    if type_code == '?':
+        return bool
+    return int
+
+
+def update_group(address: str, values: dict, ctx=None, timeout: float = 5.0) -> dict:
+    """Put new values for many mailbox PVs in one operation, via their group-update PV
+
+    Parameters
+    ----------
+    address: the group-update PV address, i.e., the mailbox prefix followed by GROUP_NAME
+    values:  a mapping of (unprefixed) PV name to its new value, which is converted to
+             the PV type as by update_values
+    ctx:     a p4p.client.thread.Context to use, or None to create (and close) one
+    timeout: the maximum time, in seconds, to wait for the get and for the put
+
+    Returns
+    -------
+    A mapping of PV name to None on success, or the Exception describing its failure.
+    The update is all or nothing: if any name is not in the group, or its value can not
+    be converted, no value is put and every name is reported as failed.
+    """
+    results: dict = {}
+    own = ctx is None
+    if ctx is None:
+        from p4p.client.thread import Context
+        ctx = Context('pva')
+    try:
+        if (converters := _GROUP_CONVERTERS.get(address)) is None:
+            group = ctx.get(address, throw=False, timeout=timeout)
+            if isinstance(group, Exception):
+                return {name: group for name in values}
+            fields = group.type()['value']
+            converters = {name: _type_code_converter(fields[name]) for name in fields.keys()}
+            _GROUP_CONVERTERS[address] = converters
+        converted = {}
+        for name, value in values.items():
+            if name not in converters:
+                results[name] = ValueError(f'{name} is not a PV of the group {address}')
+                continue
+            try:
+                converted[f'value.{name}'] = converters[name](value)
+            except (TypeError, ValueError) as e:
+                results[name] = e
+        if results:
+            # Putting the rest would apply part of one update under a single timestamp
+            failed = ValueError(f'Not put, since the value(s) of {", ".join(results)} are invalid')
+            return {name: results.get(name, failed) for name in values}
+        if converted:
+            result = ctx.put(address, converted, throw=False, timeout=timeout)
+            if result is not None:
+                # The group may have been replaced by one with different PVs
+                _GROUP_CONVERTERS.pop(address, None)
+            for field in converted:
+                results[field.removeprefix('value.')] = result
+    finally:
+        if own:
+            ctx.close()
+    return {name: results[name] for name in values}
+
+
 def get_parser():
     from argparse import ArgumentParser
     from mccode_plumber import __version__
@@ -98,20 +257,109 @@ def parse_args():
     return parameters, args
 
 
-def main(names: dict[str, NTScalar], prefix: str | None = None, filename_required: bool = True):
-    provider = StaticProvider('mailbox')  # 'mailbox' is an arbitrary name
+class MailboxService:
+    """
+    Serve the mailbox PVs of any number of instruments from one p4p Server in this process
+
+    PV sets, each identified by their prefix, can be added and removed while the
+    server runs, so many simulated instruments share one server, its threads, and
+    one import of p4p.
+
+    Parameters
+    ----------
+    server_options: keyword arguments for p4p.server.Server, e.g., isolate=True
+    """
+    def __init__(self, **server_options):
+        from threading import Lock
+        from p4p.server import StaticProvider
+        self.provider = StaticProvider('mailbox')  # 'mailbox' is an arbitrary name
+        self.server_options = server_options
+        self.server: Server | None = None
+        # we must keep a reference in order to keep the Handler from being collected
+        self.sets: dict[str, dict[str, SharedPV]] = {}
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        if self.server is None:
+            from p4p.server import Server
+            self.server = Server(providers=[self.provider], **self.server_options)
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+    def conf(self) -> dict:
+        """The client configuration needed to reach this server, see p4p.server.Server.conf"""
+        if self.server is None:
+            raise RuntimeError('The mailbox service is not running')
+        return self.server.conf()
+
+    def add(self, prefix: str | None, names: dict[str, NTScalar], filename_required: bool = True):
+        """Serve one set of mailbox PVs, and their group-update PV, under a common prefix"""
+        from p4p.nt import NTScalar
+        from p4p.server.thread import SharedPV
+        prefix = prefix or ''
+        names = dict(names)
+        if filename_required and 'mcpl_filename' not in names:
+            names['mcpl_filename'] = NTScalar('s').wrap('')
+        if GROUP_NAME in names:
+            raise ValueError(f'{GROUP_NAME} is reserved for the mailbox group-update PV')
+        pvs = {name: SharedPV(initial=value, handler=MailboxHandler()) for name, value in names.items()}
+        pvs[GROUP_NAME] = group_pv(dict(pvs), names)
+        with self._lock:
+            if prefix in self.sets:
+                raise ValueError(f'Mailbox PVs with prefix {prefix!r} are already served')
+            for name, pv in pvs.items():
+                self.provider.add(f'{prefix}{name}', pv)
+            self.sets[prefix] = pvs
+        return pvs
+
+    def remove(self, prefix: str | None):
+        """Stop serving the set of mailbox PVs with the given prefix"""
+        prefix = prefix or ''
+        with self._lock:
+            pvs = self.sets.pop(prefix)
+            for name, pv in pvs.items():
+                self.provider.remove(f'{prefix}{name}')
+                pv.close()
+
+    def forever(self):
+        """Serve until interrupted, by KeyboardInterrupt, then stop"""
+        from threading import Event
+        self.start()
+        try:
+            Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def serve_many(sets: dict[str | None, dict[str, NTScalar]], **server_options) -> MailboxService:
+    """Start one MailboxService serving the mailbox PVs of many instruments, keyed by their prefix"""
+    service = MailboxService(**server_options).start()
+    try:
+        for prefix, names in sets.items():
+            service.add(prefix, names)
+    except Exception:
+        service.stop()
+        raise
+    return service
 
-    if filename_required and 'mcpl_filename' not in names:
-        names['mcpl_filename'] = NTScalar('s').wrap('')
 
-    pvs = []  # we must keep a reference in order to keep the Handler from being collected
-    for name, value in names.items():
-        pv = SharedPV(initial=value, handler=MailboxHandler())
-        provider.add(f'{prefix}{name}' if prefix else name, pv)
-        pvs.append(pv)
-
-    print(f'Start mailbox server for {len(pvs)} PVs with prefix {prefix}')
-    Server.forever(providers=[provider])
+def main(names: dict[str, NTScalar], prefix: str | None = None, filename_required: bool = True):
+    service = MailboxService()
+    pvs = service.add(prefix, names, filename_required)
+    print(f'Start mailbox server for {len(pvs) - 1} PVs with prefix {prefix}')
+    service.forever()
     print('Done')
 
 
@@ -120,6 +368,25 @@ def run():
     main(parameters, prefix=args.prefix)
 
 
+def get_many_parser():
+    from argparse import ArgumentParser
+    from mccode_plumber import __version__
+    p = ArgumentParser(description='Serve the mailbox PVs of many instruments from one process')
+    p.add_argument('-m', '--mailbox', type=str, nargs=2, action='append', required=True,
+                   metavar=('INSTR', 'PREFIX'), help='An instrument file and its EPICS PV prefix, repeatable')
+    p.add_argument('-v', '--version', action='version', version=__version__)
+    return p
+
+
+def run_many():
+    args = get_many_parser().parse_args()
+    service = serve_many({prefix: parse_instr_nt_values(instr) for instr, prefix in args.mailbox})
+    for prefix, pvs in service.sets.items():
+        print(f'Start mailbox server for {len(pvs) - 1} PVs with prefix {prefix}')
+    service.forever()
+    print('Done')
+
+
 def start(parameters, prefix: str | None = None):
     from multiprocessing import Process
     proc = Process(target=main, args=(parameters, prefix))
@@ -133,11 +400,87 @@ def stop(proc):
     proc.close()
 
 
+# The conversion for values put to each PV address, discovered from its type on first use
+_PV_CONVERTERS: dict[str, Callable] = {}
+
+
+def _pv_converter(value):
+    from functools import partial
+    # ntnumericarray subclasses numpy.ndarray, and ntstringarray subclasses list
+    if (dtype := getattr(value, 'dtype', None)) is not None:
+        codes = {v: k for k, v in ARRAY_DTYPES.items()}
+        return partial(as_array, type_code=codes[dtype.name]) if dtype.name in codes else None
+    if isinstance(value, list):
+        return partial(as_array, type_code='as')
+    # ntint, ntfloat, and ntstr subclass their Python counterparts
+    for t in (int, float, str):
+        if isinstance(value, t):
+            return t
+    return None
+
+
+def update_values(values: dict, ctx=None, timeout: float = 5.0) -> dict:
+    """Put new values to many mailbox PVs at once
+
+    The type of each PV is fetched only the first time its address is updated, with
+    all unknown addresses fetched concurrently. All puts are then issued concurrently.
+
+    Parameters
+    ----------
+    values:  a mapping of PV address to its new value, which is converted to the PV type;
+             array PVs accept NumPy arrays (sent without per-element conversion),
+             sequences, or strings like '[1,2,3]'
+    ctx:     a p4p.client.thread.Context to use, or None to create (and close) one
+    timeout: the maximum time, in seconds, to wait for the gets and for the puts
+
+    Returns
+    -------
+    A mapping of PV address to None on success, or the Exception describing its failure
+    """
+    results: dict = {}
+    own = ctx is None
+    if ctx is None:
+        from p4p.client.thread import Context
+        ctx = Context('pva')
+    try:
+        unknown = [address for address in values if address not in _PV_CONVERTERS]
+        if unknown:
+            for address, pv in zip(unknown, ctx.get(unknown, throw=False, timeout=timeout)):
+                if isinstance(pv, Exception):
+                    results[address] = pv
+                elif (converter := _pv_converter(pv)) is None:
+                    results[address] = ValueError(f'Address {address} has unknown type {type(pv)}')
+                else:
+                    _PV_CONVERTERS[address] = converter
+        addresses, converted = [], []
+        for address, value in values.items():
+            if address in results:
+                continue
+            try:
+                converted.append(_PV_CONVERTERS[address](value))
+                addresses.append(address)
+            except ValueError as e:
+                results[address] = e
+        if addresses:
+            for address, result in zip(addresses, ctx.put(addresses, converted, throw=False, timeout=timeout)):
+                if result is not None:
+                    # The PV may have been replaced by one of a different type
+                    _PV_CONVERTERS.pop(address, None)
+                results[address] = result
+    finally:
+        if own:
+            ctx.close()
+    return {address: results[address] for address in values}
+
+
 def update():
     from argparse import ArgumentParser
-    from p4p.client.thread import Context
     parser = ArgumentParser(description="Update the mailbox server with new values")
     parser.add_argument('address value', type=str, nargs='+', help='The mailbox address and value to be updated')
+    parser.add_argument('-t', '--timeout', type=float, default=5.0, help='Seconds to wait for the mailbox server')
+    parser.add_argument('-g', '--group', type=str, default=None, metavar='ADDRESS',
+                        help='Update all values at once, with one timestamp, through this group-update PV address;'
+                             ' then provide PV names without their prefix')
     args = parser.parse_args()
     addresses_values = getattr(args, 'address value')
 
@@ -151,21 +494,16 @@ def update():
     if len(addresses_values) % 2:
         print(f'Please provide address-value pairs. Provided {addresses=} {values=}')
 
-    ctx = Context('pva')
-    for address, value in zip(addresses, values):
-        pv = ctx.get(address, throw=False)
-        if isinstance(pv, float):
-            ctx.put(address, float(value))
-        elif isinstance(pv, int):
-            ctx.put(address, int(value))
-        elif isinstance(pv, str):
-            ctx.put(address, str(value))
-        elif isinstance(pv, TimeoutError):
-            print(f'[Timeout] Failed to update {address} with {value} (Unknown to EPICS?)')
-        else:
-            raise ValueError(f'Address {address} has unknown type {type(pv)}')
-
-    ctx.disconnect()
+    pairs = dict(zip(addresses, values))
+    if args.group is not None:
+        results = update_group(args.group, pairs, timeout=args.timeout)
+    else:
+        results = update_values(pairs, timeout=args.timeout)
+    for address, result in results.items():
+        if isinstance(result, TimeoutError):
+            print(f'[Timeout] Failed to update {address} with {pairs[address]} (Unknown to EPICS?)')
+        elif result is not None:
+            print(f'Failed to update {address} with {pairs[address]}: {result}')
 
 
 def get_strings_parser():
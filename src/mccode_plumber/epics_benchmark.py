@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Benchmark utility for updating many mailbox PVs, and for mailbox server startup.
+
+Run as module:
+    python -m mccode_plumber.epics_benchmark [-n 10 100 1000]
+    python -m mccode_plumber.epics_benchmark --startup
+
+For each number of PVs, an isolated mailbox server is started in this process
+and every PV is updated, first one address at a time (a get to discover its type
+then a put, as `mp-epics-update` used to), then with `update_values` before and
+after the PV types are cached.
+
+With --startup, the cumulative import time of the modules used by `mp-epics-strings`
+is reported, along with the wall time from launching it to its PVs being served.
+"""
+from __future__ import annotations
+
+from time import perf_counter
+
+
+def _mailbox(count: int, prefix: str):
+    from p4p.nt import NTScalar
+    from p4p.server import StaticProvider
+    from p4p.server.thread import SharedPV
+    from mccode_plumber.epics import MailboxHandler
+    provider = StaticProvider('benchmark')
+    pvs = [SharedPV(initial=NTScalar('d').wrap(0.0), handler=MailboxHandler()) for _ in range(count)]
+    for i, pv in enumerate(pvs):
+        provider.add(f'{prefix}p{i}', pv)
+    return provider, pvs
+
+
+def one_at_a_time(ctx, values: dict):
+    for address, value in values.items():
+        if isinstance(ctx.get(address), float):
+            ctx.put(address, float(value))
+
+
+def benchmark_update(count: int, repeats: int = 3) -> tuple[float, float, float]:
+    """Return the best times, in seconds, to update `count` PVs one-at-a-time, in bulk, and in cached bulk"""
+    from p4p.server import Server
+    from p4p.client.thread import Context
+    from mccode_plumber.epics import update_values, _PV_CONVERTERS
+    prefix = 'benchmark:'
+    provider, pvs = _mailbox(count, prefix)
+    with Server(providers=[provider], isolate=True) as server:
+        ctx = Context('pva', conf=server.conf(), useenv=False)
+        # Connect all channels before timing, as a long-running client would be
+        ctx.get([f'{prefix}p{i}' for i in range(count)])
+        single, bulk, cached = [], [], []
+        for repeat in range(repeats):
+            values = {f'{prefix}p{i}': str(repeat + i / count) for i in range(count)}
+            start = perf_counter()
+            one_at_a_time(ctx, values)
+            single.append(perf_counter() - start)
+            # The first bulk update includes discovering the PV types
+            _PV_CONVERTERS.clear()
+            start = perf_counter()
+            update_values(values, ctx)
+            bulk.append(perf_counter() - start)
+            start = perf_counter()
+            update_values(values, ctx)
+            cached.append(perf_counter() - start)
+        ctx.close()
+    return min(single), min(bulk), min(cached)
+
+
+STARTUP_MODULES = ('mccode_plumber', 'mccode_plumber.epics', 'p4p', 'mccode_plumber.manage.epics', 'mccode_antlr')
+
+
+def import_times(module: str) -> dict[str, float]:
+    """Return the cumulative import time, in seconds, of `module` and its notable dependencies"""
+    import sys
+    from subprocess import run
+    result = run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if name.strip() in STARTUP_MODULES and cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def time_to_serving(timeout: float = 30.0) -> float:
+    """Return the wall time, in seconds, from launching mp-epics-strings to its first PV being readable"""
+    import sys
+    from os import getpid
+    from subprocess import Popen, DEVNULL
+    from p4p.client.thread import Context, TimeoutError
+    prefix = f'benchmark{getpid()}:'
+    ctx = Context('pva')
+    start = perf_counter()
+    proc = Popen([sys.executable, '-c', 'from mccode_plumber.epics import run_strings; run_strings()',
+                  '-p', prefix, 'a:d:0'], stdout=DEVNULL, stderr=DEVNULL)
+    try:
+        while perf_counter() - start < timeout:
+            try:
+                ctx.get(f'{prefix}a', timeout=0.05)
+                return perf_counter() - start
+            except TimeoutError:
+                if proc.poll() is not None:
+                    raise RuntimeError('mp-epics-strings exited before serving its PVs')
+        raise RuntimeError(f'mp-epics-strings did not serve its PVs within {timeout} s')
+    finally:
+        proc.terminate()
+        proc.wait()
+        ctx.close()
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Benchmark one-at-a-time and bulk mailbox PV updates')
+    parser.add_argument('-n', '--count', type=int, nargs='+', default=[10, 100, 1000], help='Numbers of PVs')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='Repeats per number of PVs, best is shown')
+    parser.add_argument('--startup', action='store_true', help='Benchmark mp-epics-strings startup instead')
+    args = parser.parse_args()
+
+    if args.startup:
+        for module in ('mccode_plumber.epics', 'mccode_plumber.manage.epics'):
+            times = ', '.join(f'{name} {t:.3f}' for name, t in import_times(module).items())
+            print(f'import {module}: {times} (cumulative s)')
+        print(f'mp-epics-strings time to serving: {min(time_to_serving() for _ in range(args.repeats)):.3f} s')
+        return
+
+    print(f"{'PVs':>6} {'one-at-a-time/s':>16} {'bulk/s':>10} {'cached/s':>10} {'speedup':>8}")
+    for count in args.count:
+        single, bulk, cached = benchmark_update(count, args.repeats)
+        print(f'{count:>6} {single:>16.4f} {bulk:>10.4f} {cached:>10.4f} {single / cached:>8.1f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Record the values of EPICS PVs to an HDF5 file, without a user interface
+
+Each PV is written to a group named after the PV (without its prefix), laid out
+like a NeXus NXlog: a 'time' dataset of the PV timestamps, in seconds since the
+Unix epoch, and a 'value' dataset of its values. Values received from the PV
+monitors are buffered and appended to the resizable datasets in batches.
+"""
+from __future__ import annotations
+
+from functools import partial
+from pathlib import Path
+from threading import Event, Lock
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import h5py
+
+
+class PVRecorder:
+    """Subscribe to PVs and append every value received to per-PV HDF5 datasets
+
+    Parameters
+    ----------
+    filename: the HDF5 file to create, or append to if its PV groups exist
+    prefix:   the EPICS PV prefix of the names
+    names:    the PV names, each of which names one group in the file
+    ctx:      a p4p.client.thread.Context to use, or None to create (and close) one
+    """
+    def __init__(self, filename: Path | str, prefix: str, names: list[str], ctx=None):
+        self.filename = Path(filename)
+        self.prefix = prefix
+        self.names = names
+        self.ctx = ctx
+        self.own_ctx = ctx is None
+        self.file: h5py.File | None = None
+        self.subscriptions: list = []
+        # The (timestamp, value) pairs received for each PV name since the last flush
+        self.buffers: dict[str, list] = {name: [] for name in names}
+        self.counts: dict[str, int] = {name: 0 for name in names}
+        self.lock = Lock()
+        self.stopped = Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        import h5py
+        if self.ctx is None:
+            from p4p.client.thread import Context
+            self.ctx = Context('pva')
+        self.file = h5py.File(self.filename, 'a')
+        self.subscriptions = [self.ctx.monitor(f'{self.prefix}{name}', partial(self.callback, name))
+                              for name in self.names]
+
+    def callback(self, name: str, value):
+        """Buffer one value of a PV, called from a Context worker thread"""
+        if isinstance(value, Exception):
+            # Only values are recorded, not (dis)connection events
+            return
+        with self.lock:
+            # The underlying value, since the str of p4p's ntstr includes its timestamp
+            self.buffers[name].append((value.timestamp, value.raw.value))
+
+    def flush(self) -> int:
+        """Append all buffered values to the file, returning the number of values written"""
+        with self.lock:
+            buffers = {name: values for name, values in self.buffers.items() if values}
+            self.buffers = {name: [] for name in self.names}
+        for name, values in buffers.items():
+            self._append(name, values)
+            self.counts[name] += len(values)
+        if buffers and self.file is not None:
+            self.file.flush()
+        return sum(len(values) for values in buffers.values())
+
+    def _append(self, name: str, values: list):
+        import h5py
+        from numpy import asarray
+        assert self.file is not None
+        times = asarray([t for t, _ in values], dtype='float64')
+        if name not in self.file:
+            self._create(name, values[0][1])
+        group = self.file[name]
+        dtype = group['value'].dtype
+        start = group['time'].shape[0]
+        for dataset in (group['time'], group['value']):
+            dataset.resize((start + len(values),))
+        group['time'][start:] = times
+        if h5py.check_string_dtype(dtype):
+            group['value'][start:] = asarray([str(v) for _, v in values], dtype=object)
+        elif (element := h5py.check_vlen_dtype(dtype)) is not None:
+            # h5py can mistake a batch of equal-length arrays for one 2-D array, so write each in turn
+            for index, (_, v) in enumerate(values):
+                group['value'][start + index] = asarray(v, dtype=element)
+        else:
+            group['value'][start:] = asarray([v for _, v in values], dtype=dtype)
+
+    def _create(self, name: str, value):
+        import h5py
+        from numpy import asarray
+        if isinstance(value, str):
+            dtype = h5py.string_dtype()
+        elif isinstance(value, list):
+            dtype = h5py.vlen_dtype(h5py.string_dtype())
+        elif hasattr(value, 'dtype'):
+            dtype = h5py.vlen_dtype(value.dtype)
+        else:
+            dtype = asarray(value).dtype
+        assert self.file is not None
+        group = self.file.create_group(name)
+        group.attrs['NX_class'] = 'NXlog'
+        group.attrs['source'] = f'{self.prefix}{name}'
+        time = group.create_dataset('time', shape=(0,), maxshape=(None,), dtype='float64', chunks=True)
+        time.attrs['units'] = 's'
+        time.attrs['start'] = '1970-01-01T00:00:00Z'
+        group.create_dataset('value', shape=(0,), maxshape=(None,), dtype=dtype, chunks=True)
+
+    def run(self, interval: float = 1.0, duration: float | None = None):
+        """Flush the buffered values every `interval` seconds, until stopped or for `duration` seconds"""
+        from time import monotonic
+        if not interval > 0:
+            raise ValueError(f'The flush interval must be positive, not {interval}')
+        end = None if duration is None else monotonic() + duration
+        while not self.stopped.wait(interval if end is None else max(0.0, min(interval, end - monotonic()))):
+            self.flush()
+            if end is not None and monotonic() >= end:
+                break
+
+    def stop(self):
+        self.stopped.set()
+        for subscription in self.subscriptions:
+            subscription.close()
+        self.subscriptions = []
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+        if self.own_ctx and self.ctx is not None:
+            self.ctx.close()
+            self.ctx = None
+
+
+def record(filename: Path | str, prefix: str, names: list[str], interval: float = 1.0,
+           duration: float | None = None):
+    """Record PV values to `filename` until interrupted, or for `duration` seconds"""
+    with PVRecorder(filename, prefix, names) as recorder:
+        try:
+            recorder.run(interval, duration)
+        except KeyboardInterrupt:
+            pass
+    for name, count in recorder.counts.items():
+        print(f'{prefix}{name}: {count} values')
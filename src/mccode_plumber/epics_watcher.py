@@ -7,12 +7,19 @@ from textual import events
 from p4p.client.thread import Context
 from p4p.client.thread import Disconnected
 
-import asyncio
-import threading
+from functools import partial
+from threading import Lock
+from time import monotonic
+
+# The default number of times per second that the PV widgets are refreshed
+REFRESH_RATE = 10.0
+# The interval, in seconds, over which the update rate of each PV is measured
+RATE_INTERVAL = 1.0
 
 
 class PVWidget(Static):
     value: reactive[str] = reactive("Connecting...")
+    rate: reactive[float] = reactive(0.0)
 
     def __init__(self, pvname: str):
         super().__init__()
@@ -20,16 +27,28 @@ class PVWidget(Static):
         self.sid = pvname.replace(':', '')
         self.set_class(True, "pv-widget")
         self.value_widget = None  # Store reference directly
+        self.rate_widget: Static | None = None
 
     def compose(self) -> ComposeResult:
         yield Static(f"[b]{self.pvname}[/b]", id=f"label-{self.sid}")
         self.value_widget = Static(self.value, id=f"value-{self.sid}")
         yield self.value_widget
+        rate_widget = Static(self.rate_text(self.rate), id=f"rate-{self.sid}", classes="pv-rate")
+        self.rate_widget = rate_widget
+        yield rate_widget
+
+    @staticmethod
+    def rate_text(rate: float) -> str:
+        return f"{rate:.1f} updates/s"
 
     def watch_value(self, value: str):
         if self.value_widget:
             self.value_widget.update(value)
 
+    def watch_rate(self, rate: float):
+        if self.rate_widget:
+            self.rate_widget.update(self.rate_text(rate))
+
     def update_value(self, new_value: str):
         self.value = new_value
 
@@ -40,15 +59,27 @@ class PVMonitorApp(App):
         border: round $primary;
         margin: 1;
     }
+    .pv-rate {
+        color: $text-muted;
+    }
     """
 
-    def __init__(self, prefix: str, names: list[str]):
+    def __init__(self, prefix: str, names: list[str], rate: float = REFRESH_RATE):
         super().__init__()
         self.pv_widgets = {}
         self.ctx = Context("pva")  # Or 'ca' if using Channel Access
         self.prefix = prefix
         self.names = names
         self.grid = None
+        self.subscriptions: list = []
+        self.rate = rate
+        # The latest value received for each PV since the last refresh, filled by monitor callbacks;
+        # intermediate values are dropped so the refresh cost does not depend on the PV update rates
+        self.pending: dict[str, object] = {}
+        # The number of values received for each PV since its update rate was last shown
+        self.counts: dict[str, int] = {}
+        self.counts_since = monotonic()
+        self.pending_lock = Lock()
 
     def compose(self) -> ComposeResult:
         from textual.containers import Grid
@@ -63,45 +94,93 @@ class PVMonitorApp(App):
             widget = PVWidget(pv)
             self.pv_widgets[pv] = widget
             self.grid.mount(widget)
-            threading.Thread(target=self.monitor_pv, args=(pv,), daemon=True).start()
-
-    def monitor_pv(self, pvname: str):
-        def callback(value):
-            if isinstance(value, Disconnected):
-                new_value = "Disconnected"
-            else:
-                new_value = str(value)
-            # Schedule update on the main thread
-            asyncio.run_coroutine_threadsafe(
-                self.update_widget_value(pvname, new_value),
-                self._loop,
-            )
-
-        self.ctx.monitor(pvname, callback)
-
-    async def update_widget_value(self, pvname: str, new_value: str):
-        widget = self.pv_widgets.get(pvname)
-        if widget:
-            widget.update_value(new_value)
-
-    async def on_shutdown(self) -> None:
+        # Context.monitor does not block, so every subscription shares the one Context and its workers
+        self.subscriptions = [self.ctx.monitor(pv, partial(self.monitor_callback, pv), notify_disconnect=True)
+                              for pv in self.pv_widgets]
+        self.counts_since = monotonic()
+        self.set_interval(1 / self.rate, self.refresh_widgets)
+
+    def monitor_callback(self, pvname: str, value):
+        """Record the latest value of a PV, called from a Context worker thread"""
+        with self.pending_lock:
+            self.pending[pvname] = value
+            self.counts[pvname] = self.counts.get(pvname, 0) + 1
+
+    def refresh_widgets(self) -> None:
+        """Show the latest values received since the last refresh, and periodically the update rates"""
+        now = monotonic()
+        counts = None
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+            if (elapsed := now - self.counts_since) >= RATE_INTERVAL:
+                counts, self.counts, self.counts_since = self.counts, {}, now
+        if not pending and counts is None:
+            return
+        with self.batch_update():
+            for pvname, value in pending.items():
+                if widget := self.pv_widgets.get(pvname):
+                    widget.update_value("Disconnected" if isinstance(value, Disconnected) else str(value))
+            if counts is not None:
+                for pvname, widget in self.pv_widgets.items():
+                    widget.rate = counts.get(pvname, 0) / elapsed
+
+    async def on_unmount(self) -> None:
+        for subscription in self.subscriptions:
+            subscription.close()
         self.ctx.close()
 
 
 
+def _positive_argument(value: str, description: str) -> float:
+    from argparse import ArgumentTypeError
+    from math import isfinite
+    number = float(value)
+    if not (number > 0 and isfinite(number)):
+        raise ArgumentTypeError(f'The {description} must be a positive number, not {value}')
+    return number
+
+
+def _rate_argument(value: str) -> float:
+    return _positive_argument(value, 'refresh rate')
+
+
+def _interval_argument(value: str) -> float:
+    return _positive_argument(value, 'flush interval')
+
+
+def add_record_arguments(p):
+    p.add_argument('--record', type=str, default=None, metavar='FILE',
+                   help='Record every PV value to this HDF5 file, without a user interface')
+    p.add_argument('--flush-interval', type=_interval_argument, default=1.0,
+                   help='Seconds between writes of the recorded values, default 1')
+    p.add_argument('--duration', type=float, default=None,
+                   help='Seconds to record for, default until interrupted')
+
+
+def watch(prefix: str, names: list[str], args):
+    if args.record is not None:
+        from mccode_plumber.epics_recorder import record
+        record(args.record, prefix, names, args.flush_interval, args.duration)
+    else:
+        PVMonitorApp(prefix, names, args.rate).run()
+
+
 def get_names_parser():
     from argparse import ArgumentParser
     from mccode_plumber import __version__
     p = ArgumentParser()
     p.add_argument('name', type=str, nargs='+', help='The NTScalar names to watch')
     p.add_argument('-p', '--prefix', type=str, help='The EPICS PV prefix to use', default='mcstas:')
+    p.add_argument('-r', '--rate', type=_rate_argument, default=REFRESH_RATE,
+                   help=f'The maximum number of display refreshes per second, default {REFRESH_RATE}')
+    add_record_arguments(p)
     p.add_argument('-v', '--version', action='version', version=__version__)
     return p
 
 
 def run_strings():
     args = get_names_parser().parse_args()
-    PVMonitorApp(args.prefix, args.name).run()
+    watch(args.prefix, args.name, args)
 
 
 def get_instr_parser():
@@ -110,6 +189,9 @@ def get_instr_parser():
     p = ArgumentParser()
     p.add_argument('instr', type=str, help='The instrument which defines names to watch')
     p.add_argument('-p', '--prefix', type=str, help='The EPICS PV prefix to use', default='mcstas:')
+    p.add_argument('-r', '--rate', type=_rate_argument, default=REFRESH_RATE,
+                   help=f'The maximum number of display refreshes per second, default {REFRESH_RATE}')
+    add_record_arguments(p)
     p.add_argument('-v', '--version', action='version', version=__version__)
     return p
 
@@ -118,7 +200,7 @@ def run_instr():
     args = get_instr_parser().parse_args()
     _, parameters = get_instr_name_and_parameters(args.instr)
     names = [p.name for p in parameters]
-    PVMonitorApp(args.prefix, names).run()
+    watch(args.prefix, names, args)
 
 
 if __name__ == '__main__':
@@ -6,7 +6,17 @@ list of EPICS PVs to monitor.
 
 Alternatively, the same functionality can be accessed from Python using the configure_forwarder and reset_forwarder
 functions. Which take PV information and Forwarder/Kafka configuration as arguments.
+
+The streams sent to each Forwarder configuration topic are remembered in a ForwarderRecord, which allows
+synchronise_forwarder (and the `delta` option of the other functions) to send only the difference between the
+requested and already-configured streams.
 """
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
 from mccode_antlr.common import InstrumentParameter
 
 
@@ -31,37 +41,401 @@ def normalise_pvs(pvs: list[dict], config=None, prefix=None, topic=None):
     return cfg_broker, cfg_topic, pvs
 
 
+class UpdatePolicy(Enum):
+    """
+    When the Forwarder sends a PV value to Kafka
+
+    CHANGE:   only when the value changes
+    PERIODIC: when the value changes, and repeated every update period of the
+              Forwarder (its --pv-update-period) if it does not
+    """
+    CHANGE = 'change'
+    PERIODIC = 'periodic'
+
+
 def streams(pvs: list[dict]):
     from streaming_data_types.forwarder_config_update_fc00 import StreamInfo, Protocol
-    return [StreamInfo(pv['source'], pv['module'], pv['topic'], Protocol.Protocol.PVA, periodic=False) for pv in pvs]
+    return [StreamInfo(pv['source'], pv['module'], pv['topic'], Protocol.Protocol.PVA,
+                       periodic=int(pv.get('periodic', False))) for pv in pvs]
+
+
+def stream_key(pv: dict) -> tuple:
+    """The identity of a forwarded stream, used to compare configurations"""
+    return pv['source'], pv['module'], pv['topic']
+
+
+def _record_key(pv: dict) -> tuple:
+    """The identity and update policy of a forwarded stream
+
+    A stream whose policy changes must be removed and re-added to the Forwarder
+    """
+    return stream_key(pv) + (bool(pv.get('periodic', False)),)
+
+
+def _record_directory() -> Path:
+    """The directory of the user's ForwarderRecord files, which other users can not write to"""
+    import os
+    from getpass import getuser
+    from tempfile import gettempdir
+    try:
+        user = getuser()
+    except (KeyError, OSError):
+        user = str(getattr(os, 'getuid', lambda: 'user')())
+    return Path(gettempdir()) / f'mccode-plumber-{user}'
+
+
+@dataclass
+class ForwarderRecord:
+    """
+    The streams a Forwarder has been configured to forward, persisted between processes
+
+    Properties
+    ----------
+    broker: the Kafka broker of the Forwarder configuration topic
+    topic:  the Forwarder configuration topic
+    path:   the JSON file holding the record, by default in a per-user temporary directory
+    pvs:    the configured streams, keyed by their identity and update policy
+    """
+    broker: str
+    topic: str
+    path: Path | None = None
+    pvs: dict[tuple, dict] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.path is None:
+            name = f'forwarder_{self.broker}_{self.topic}.json'.translate(str.maketrans(':/\\', '___'))
+            self.path = _record_directory() / name
 
+    @classmethod
+    def load(cls, broker: str, topic: str, path: Path | None = None):
+        from json import loads, JSONDecodeError
+        record = cls(broker, topic, path)
+        assert record.path is not None
+        try:
+            pvs = loads(record.path.read_text())
+        except (OSError, JSONDecodeError):
+            pvs = []
+        record.pvs = {_record_key(pv): pv for pv in pvs}
+        return record
 
-def configure_forwarder(pvs: list[dict], config=None, prefix=None, topic=None):
-    from confluent_kafka import Producer
+    @classmethod
+    @contextmanager
+    def locked(cls, broker: str, topic: str, path: Path | None = None):
+        """Load the record, and save any changes made to it, holding a lock throughout
+
+        Concurrent processes which change the same record do so one at a time, so none
+        overwrites the changes of another. The record is not saved if an exception is raised.
+        """
+        record = cls(broker, topic, path)
+        assert record.path is not None
+        record.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with record.path.with_suffix('.lock').open('a') as lock:
+            try:
+                from fcntl import flock, LOCK_EX
+                flock(lock, LOCK_EX)
+            except ImportError:
+                # Without fcntl, e.g., on Windows, concurrent changes are not excluded
+                pass
+            record = cls.load(broker, topic, path)
+            yield record
+            record.save()
+
+    def save(self):
+        from json import dumps
+        from tempfile import NamedTemporaryFile
+        assert self.path is not None
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Write then rename so that a concurrent reader never sees a partial file,
+        # through a uniquely named file so that concurrent writers do not share one
+        with NamedTemporaryFile('w', dir=self.path.parent, prefix=self.path.stem, suffix='.tmp',
+                                delete=False) as temporary:
+            temporary.write(dumps(list(self.pvs.values())))
+        try:
+            Path(temporary.name).replace(self.path)
+        except OSError:
+            Path(temporary.name).unlink(missing_ok=True)
+            raise
+
+    def clear(self):
+        self.pvs = {}
+        self.save()
+
+    def add(self, pvs: list[dict]):
+        self.pvs.update({_record_key(pv): pv for pv in pvs})
+
+    def remove(self, pvs: list[dict]):
+        for pv in pvs:
+            self.pvs.pop(_record_key(pv), None)
+
+    def missing(self, pvs: list[dict]) -> list[dict]:
+        """The streams in pvs which are not configured"""
+        return [pv for pv in pvs if _record_key(pv) not in self.pvs]
+
+    def present(self, pvs: list[dict]) -> list[dict]:
+        """The streams in pvs which are configured"""
+        return [pv for pv in pvs if _record_key(pv) in self.pvs]
+
+    def extra(self, pvs: list[dict], prefix: str = '') -> list[dict]:
+        """The configured streams with sources starting with prefix which are not in pvs"""
+        keys = {_record_key(pv) for pv in pvs}
+        return [pv for key, pv in self.pvs.items() if key not in keys and pv['source'].startswith(prefix)]
+
+
+def _check_chunk(chunk: int | None):
+    if chunk is not None and chunk < 1:
+        raise ValueError(f'Configuration messages must hold at least one stream, not {chunk}')
+
+
+def _chunk_argument(value: str) -> int:
+    from argparse import ArgumentTypeError
+    try:
+        chunk = int(value)
+        _check_chunk(chunk)
+    except ValueError as e:
+        raise ArgumentTypeError(str(e)) from e
+    return chunk
+
+
+def _send_forwarder_update(cfg_broker: str, cfg_topic: str, update_type, pvs: list[dict], chunk: int | None = None,
+                           timeout: float = 10.0):
+    """Send fc00 messages, of at most `chunk` streams each, using the broker's pooled producer
+
+    Raises a RuntimeError if any message is not delivered within timeout seconds, so that
+    callers do not record streams as configured (or removed) which the Forwarder never received.
+    """
+    from mccode_plumber.kafka import get_producer
     from streaming_data_types.forwarder_config_update_fc00 import serialise_fc00 as serialise
+    _check_chunk(chunk)
+    producer = get_producer(cfg_broker)
+    infos = streams(pvs)
+    step = chunk if chunk else max(len(infos), 1)
+    errors = []
+
+    def delivered(error, message):
+        if error is not None:
+            errors.append(error)
+
+    for start in range(0, len(infos), step):
+        producer.produce(cfg_topic, serialise(update_type, infos[start:start + step]), on_delivery=delivered)
+    if undelivered := producer.flush(timeout):
+        raise RuntimeError(f'{undelivered} Forwarder configuration messages not delivered to {cfg_broker} '
+                           f'within {timeout} seconds')
+    if errors:
+        raise RuntimeError(f'Forwarder configuration not delivered to {cfg_broker}/{cfg_topic}: {errors[0]}')
+
+
+def configure_forwarder(pvs: list[dict], config=None, prefix=None, topic=None, delta: bool = False,
+                        chunk: int | None = None):
+    """Tell the Forwarder to add streams, optionally only those not already recorded as configured
+
+    Very long stream lists can be split into several messages of at most `chunk` streams.
+    """
     from streaming_data_types.fbschemas.forwarder_config_update_fc00.UpdateType import UpdateType
 
+    _check_chunk(chunk)
     cfg_broker, cfg_topic, pvs = normalise_pvs(pvs, config, prefix, topic)
-    producer = Producer({"bootstrap.servers": cfg_broker})
-    producer.produce(cfg_topic, serialise(UpdateType.ADD, streams(pvs)))
-    producer.flush()
+    with ForwarderRecord.locked(cfg_broker, cfg_topic) as record:
+        add = record.missing(pvs) if delta else pvs
+        if add:
+            _send_forwarder_update(cfg_broker, cfg_topic, UpdateType.ADD, add, chunk)
+        record.add(add)
     return pvs
 
 
-def reset_forwarder(pvs: list[dict], config=None, prefix=None, topic=None):
-    from confluent_kafka import Producer
-    from streaming_data_types.forwarder_config_update_fc00 import serialise_fc00 as serialise
+def reset_forwarder(pvs: list[dict], config=None, prefix=None, topic=None, delta: bool = False,
+                    chunk: int | None = None):
+    """Tell the Forwarder to remove streams, optionally only those recorded as configured"""
+    from streaming_data_types.fbschemas.forwarder_config_update_fc00.UpdateType import UpdateType
+
+    _check_chunk(chunk)
+    cfg_broker, cfg_topic, pvs = normalise_pvs(pvs, config, prefix, topic)
+    with ForwarderRecord.locked(cfg_broker, cfg_topic) as record:
+        remove = record.present(pvs) if delta else pvs
+        if remove:
+            _send_forwarder_update(cfg_broker, cfg_topic, UpdateType.REMOVE, remove, chunk)
+        record.remove(remove)
+    return pvs
+
+
+def synchronise_forwarder(pvs: list[dict], config=None, prefix=None, topic=None, chunk: int | None = None):
+    """Make the Forwarder forward exactly the provided streams under a prefix, sending only the changes
+
+    Streams recorded as configured, with sources under the prefix, but not requested are
+    removed, and requested streams which are not recorded are added. Streams under other
+    prefixes, e.g., of other instruments sharing the Forwarder, are left unchanged.
+    Repeating the same configuration sends nothing.
+    """
     from streaming_data_types.fbschemas.forwarder_config_update_fc00.UpdateType import UpdateType
 
+    _check_chunk(chunk)
     cfg_broker, cfg_topic, pvs = normalise_pvs(pvs, config, prefix, topic)
-    producer = Producer({"bootstrap.servers": cfg_broker})
-    producer.produce(cfg_topic, serialise(UpdateType.REMOVE, streams(pvs)))
-    producer.flush()
+    with ForwarderRecord.locked(cfg_broker, cfg_topic) as record:
+        remove, add = record.extra(pvs, 'mcstas:' if prefix is None else prefix), record.missing(pvs)
+        if remove:
+            _send_forwarder_update(cfg_broker, cfg_topic, UpdateType.REMOVE, remove, chunk)
+            record.remove(remove)
+        if add:
+            _send_forwarder_update(cfg_broker, cfg_topic, UpdateType.ADD, add, chunk)
+            record.add(add)
     return pvs
 
 
-def forwarder_partial_streams(prefix: str, topic: str, parameters: list[InstrumentParameter]):
+def forwarder_status_streams(status_json: str) -> set[tuple]:
+    """Extract the stream_key of every stream listed in a Forwarder x5f2 status JSON string"""
+    from json import loads
+    out = set()
+    for stream in loads(status_json or '{}').get('streams', []):
+        source = stream.get('channel_name', stream.get('channel'))
+        module = stream.get('schema', stream.get('module'))
+        topic = stream.get('output_topic', stream.get('topic'))
+        out.add((source, module, topic))
+    return out
+
+
+class ForwarderStatusWatcher:
+    """
+    Follow the status messages which a Forwarder publishes to its status topic
+
+    The watcher starts from the most-recent status message already in the topic,
+    so the current configuration is known as soon as that message is read.
+
+    Properties
+    ----------
+    streams:  the stream_keys of the streams reported by the latest status message,
+              or None if no status message has been received
+    received: the time the latest status message was received, if any
+    """
+    def __init__(self, status: str | None = None):
+        from uuid import uuid4
+        from confluent_kafka import Consumer
+        if status is None:
+            status = "localhost:9092/ForwardStatus"
+        if '/' not in status:
+            raise RuntimeError('Expected / to separate broker and topic in Forwarder Kafka status specification')
+        broker, self.topic = status.split('/', 1)
+        self.streams: set[tuple] | None = None
+        self.received: float | None = None
+        self._consumer = Consumer({
+            'bootstrap.servers': broker,
+            'group.id': f'mccode-plumber-{uuid4()}',
+            'enable.auto.commit': False,
+            'auto.offset.reset': 'latest',
+        })
+        try:
+            assignment = self._assignment()
+        except RuntimeError:
+            self._consumer.close()
+            raise
+        self._consumer.assign(assignment)
+
+    def _assignment(self) -> list:
+        """The partitions of the status topic, each from its most-recent message"""
+        from confluent_kafka import KafkaException, TopicPartition
+        try:
+            metadata = self._consumer.list_topics(self.topic, timeout=10.0)
+            topic = metadata.topics.get(self.topic)
+            if topic is None or topic.error is not None:
+                problem = 'does not exist' if topic is None else topic.error
+                raise RuntimeError(f'The Forwarder status topic {self.topic} is not available: {problem}')
+            assignment = []
+            for partition in topic.partitions:
+                tp = TopicPartition(self.topic, partition)
+                low, high = self._consumer.get_watermark_offsets(tp, timeout=10.0)
+                tp.offset = max(low, high - 1)
+                assignment.append(tp)
+        except KafkaException as e:
+            raise RuntimeError(f'The Forwarder status topic {self.topic} is not available: {e}') from e
+        return assignment
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._consumer.close()
+
+    def poll(self, timeout: float = 1.0) -> bool:
+        """Wait up to timeout seconds for a status message, returning whether one was read"""
+        from time import time
+        from streaming_data_types.status_x5f2 import deserialise_x5f2
+        from streaming_data_types.exceptions import StreamingDataTypesException
+        message = self._consumer.poll(timeout)
+        if message is None or message.error():
+            return False
+        try:
+            status = deserialise_x5f2(message.value())
+        except StreamingDataTypesException:
+            return False
+        self.streams = forwarder_status_streams(status.status_json)
+        self.received = time()
+        return True
+
+    def active(self, pvs: list[dict]) -> bool:
+        """Whether the latest status reports all streams in pvs"""
+        return self.streams is not None and all(stream_key(pv) in self.streams for pv in pvs)
+
+    def wait_until_streams_active(self, pvs: list[dict], timeout: float = 10.0) -> bool:
+        """Read status messages until all streams in pvs are reported, or timeout seconds pass"""
+        from time import monotonic
+        give_up = monotonic() + timeout
+        while not self.active(pvs) and (remaining := give_up - monotonic()) > 0:
+            self.poll(min(remaining, 1.0))
+        return self.active(pvs)
+
+
+def verify_forwarder(pvs: list[dict], config=None, status=None, prefix=None, topic=None, timeout: float = 10.0):
+    """Wait until the Forwarder reports forwarding all provided streams
+
+    If the Forwarder reports a configuration which lacks some streams, e.g., because it was
+    restarted after they were recorded as configured, the missing streams are sent again.
+
+    Returns
+    -------
+    True if all streams were reported within the timeout (per attempt), False if they
+    were not, or if the status topic could not be read
+    """
+    cfg_broker, cfg_topic, pvs = normalise_pvs(pvs, config, prefix, topic)
+    if not pvs:
+        return True
+    if status is None:
+        status = f'{cfg_broker}/ForwardStatus'
+    try:
+        watcher = ForwarderStatusWatcher(status)
+    except RuntimeError as e:
+        print(f'Could not verify the Forwarder configuration: {e}')
+        return False
+    with watcher:
+        if watcher.wait_until_streams_active(pvs, timeout):
+            return True
+        if watcher.streams is None:
+            return False
+        missing = [pv for pv in pvs if stream_key(pv) not in watcher.streams]
+        configure_forwarder(missing, f'{cfg_broker}/{cfg_topic}', prefix, topic)
+        return watcher.wait_until_streams_active(pvs, timeout)
+
+
+def forwarder_partial_streams(
+        prefix: str,
+        topic: str,
+        parameters: list[InstrumentParameter],
+        policies: dict[str, UpdatePolicy] | None = None,
+        policy: UpdatePolicy = UpdatePolicy.CHANGE,
+):
+    """Minimal Forwarder stream information for the numeric instrument parameters
+
+    Parameters
+    ----------
+    prefix:     the EPICS PV prefix of the parameters
+    topic:      the Kafka topic to forward the parameter values to
+    parameters: the instrument parameters
+    policies:   the UpdatePolicy of individual parameters, by name
+    policy:     the UpdatePolicy of parameters not in `policies`
+    """
     from mccode_antlr.common import DataType
+    if policies is None:
+        policies = {}
     # The streaming-data-type f144 only supports numeric data, so we need to
     # filter out string-valued data types to avoid annoying error messages in the
     # forwarder's log output.
@@ -74,7 +448,8 @@ def forwarder_partial_streams(prefix: str, topic: str, parameters: list[Instrume
     #    names.append("mcpl_filename")
 
     # Minimal information used by the forwarder for stream setup:
-    partial = [dict(source=f'{prefix}{n}', module='f144', topic=topic) for n in names]
+    partial = [dict(source=f'{prefix}{n}', module='f144', topic=topic,
+                    periodic=policies.get(n, policy) == UpdatePolicy.PERIODIC) for n in names]
     return partial
 
 
@@ -88,18 +463,30 @@ def parse_registrar_args():
     parser.add_argument('instrument', type=str, help="The mcstas instrument with EPICS PVs")
     parser.add_argument('-c', '--config', type=str, help="The Kafka server and topic for configuring the Forwarder")
     parser.add_argument('-t', '--topic', type=str, help="The Kafka topic to instruct the Forwarder to send data to")
+    parser.add_argument('-d', '--delta', action='store_true',
+                        help="Only send streams not already recorded as configured (setup) or recorded (teardown)")
+    parser.add_argument('--chunk', type=_chunk_argument, default=None,
+                        help="Maximum number of streams per configuration message")
+    parser.add_argument('--periodic', type=str, action='append', default=None, metavar='NAME',
+                        help="Parameter to also send periodically, not only on change, repeatable")
+    parser.add_argument('--periodic-all', action='store_true', help="Send all parameters periodically")
     parser.add_argument('-v', '--version', action='version', version=__version__)
 
     args = parser.parse_args()
-    params = forwarder_partial_streams(args.prefix, args.topic, get_mccode_instr_parameters(args.instrument))
+    policies = {name: UpdatePolicy.PERIODIC for name in args.periodic or []}
+    policy = UpdatePolicy.PERIODIC if args.periodic_all else UpdatePolicy.CHANGE
+    params = forwarder_partial_streams(args.prefix, args.topic, get_mccode_instr_parameters(args.instrument),
+                                       policies, policy)
     return params, args
 
 
 def setup():
     parameters, args = parse_registrar_args()
-    configure_forwarder(parameters, config=args.config, prefix=args.prefix, topic=args.topic)
+    configure_forwarder(parameters, config=args.config, prefix=args.prefix, topic=args.topic, delta=args.delta,
+                        chunk=args.chunk)
 
 
 def teardown():
     parameters, args = parse_registrar_args()
-    reset_forwarder(parameters, config=args.config, prefix=args.prefix, topic=args.topic)
+    reset_forwarder(parameters, config=args.config, prefix=args.prefix, topic=args.topic, delta=args.delta,
+                    chunk=args.chunk)
@@ -1,4 +1,8 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
 from enum import Enum
+from threading import Lock
 
 
 class KafkaTopic(Enum):
@@ -6,12 +10,55 @@ class KafkaTopic(Enum):
     EXISTS = 2
     ERROR = 3
     UNKNOWN = 4
+    EXPANDED = 5
 
 
 def all_exist(topic_enums):
     if any(not isinstance(v, KafkaTopic) for v in topic_enums):
         raise ValueError('Only KafkaTopic enumerated values supported')
-    return all(v == KafkaTopic.EXISTS or v == KafkaTopic.CREATED for v in topic_enums)
+    return all(v in (KafkaTopic.EXISTS, KafkaTopic.CREATED, KafkaTopic.EXPANDED) for v in topic_enums)
+
+
+@dataclass
+class TopicProfile:
+    """
+    Kafka topic creation settings
+
+    Properties
+    ----------
+    partitions:         the number of partitions, which limits consumer parallelism
+    replication_factor: the number of brokers holding a copy of each partition
+    segment_bytes:      the log segment file size, or None for the broker default
+    retention_ms:       the time to keep messages, or None for the broker default
+    compression:        the topic compression type, e.g., 'lz4', or None for the
+                        broker default, which keeps the producer's compression
+    max_message_bytes:  the largest message the topic accepts
+    """
+    partitions: int = 1
+    replication_factor: int = 1
+    segment_bytes: int | None = None
+    retention_ms: int | None = None
+    compression: str | None = None
+    max_message_bytes: int = 104857600
+
+    def config(self) -> dict[str, str]:
+        config = {'max.message.bytes': str(self.max_message_bytes)}
+        if self.segment_bytes is not None:
+            config['segment.bytes'] = str(self.segment_bytes)
+        if self.retention_ms is not None:
+            config['retention.ms'] = str(self.retention_ms)
+        if self.compression is not None:
+            config['compression.type'] = self.compression
+        return config
+
+
+TOPIC_PROFILES = {
+    'default': TopicProfile(),
+    # High-rate detector events (ev44) written by one or more EFUs
+    'events': TopicProfile(partitions=4),
+    # Histogrammed monitor data (da00) sent by splitrun, typically large messages
+    'monitor': TopicProfile(partitions=4),
+}
 
 
 def parse_kafka_topic_args():
@@ -21,48 +68,211 @@ def parse_kafka_topic_args():
     parser.add_argument('-b', '--broker', type=str, help='The Kafka broker server to interact with')
     parser.add_argument('topic', nargs="+", type=str, help='The Kafka topic(s) to register')
     parser.add_argument('-q', '--quiet', action='store_true', help='Quiet (positive) failure')
+    parser.add_argument('--profile', type=str, choices=list(TOPIC_PROFILES), default='default',
+                        help='The named topic profile to create the topic(s) with')
+    parser.add_argument('--partitions', type=int, default=None, help='Override the profile number of partitions')
+    parser.add_argument('--expand', action='store_true', help='Add partitions to existing topics with too few')
     parser.add_argument('-v', '--version', action='version', version=__version__)
 
     args = parser.parse_args()
     return args
 
 
-def register_kafka_topics(broker: str, topics: list[str]):
-    from confluent_kafka.admin import AdminClient, NewTopic
-    client = AdminClient({"bootstrap.servers": broker})
-    config = {
-        # 'cleanup.policy': 'delete',
-        # 'delete.retention.ms': 60000,
-        'max.message.bytes': '104857600',
-        # 'retention.bytes': 10737418240,
-        # 'retention.ms': 30000,
-        # 'segment.bytes': 104857600,
-        # 'segment.ms': 60000
-    }
-    new_ts = [NewTopic(t, num_partitions=1, replication_factor=1, config=config) for t in topics]
-    futures = client.create_topics(new_ts)
-    results = {}
-    for topic, future in futures.items():
+_POOL_LOCK = Lock()
+_ADMIN_CLIENTS: dict = {}
+_KNOWN_TOPICS: dict[str, dict[str, int]] = {}
+_PRODUCERS: dict = {}
+
+
+def get_admin_client(broker: str):
+    """Return the AdminClient shared by all users of one broker, creating it if needed"""
+    from confluent_kafka.admin import AdminClient
+    with _POOL_LOCK:
+        if broker not in _ADMIN_CLIENTS:
+            _ADMIN_CLIENTS[broker] = AdminClient({"bootstrap.servers": broker})
+        return _ADMIN_CLIENTS[broker]
+
+
+def known_kafka_topics(broker: str, refresh: bool = False, timeout: float = 10.0) -> dict[str, int]:
+    """Return the cached topic names, and their partition counts, known to a broker
+
+    Parameters
+    ----------
+    broker:  the Kafka broker to query
+    refresh: replace the cached information with the broker's current metadata
+    timeout: the maximum time, in seconds, to wait for the broker metadata
+    """
+    if refresh or broker not in _KNOWN_TOPICS:
+        from confluent_kafka import KafkaException
+        try:
+            metadata = get_admin_client(broker).list_topics(timeout=timeout)
+        except KafkaException:
+            # The broker is unreachable, so nothing is known about its topics
+            return dict(_KNOWN_TOPICS.get(broker, {}))
+        with _POOL_LOCK:
+            _KNOWN_TOPICS[broker] = {n: len(t.partitions) for n, t in metadata.topics.items()}
+    return dict(_KNOWN_TOPICS[broker])
+
+
+def get_producer(broker: str):
+    """Return the Producer shared by all users of one broker, creating it if needed
+
+    Pooled producers are flushed when the interpreter exits, or by close_producers.
+    """
+    from confluent_kafka import Producer
+    with _POOL_LOCK:
+        if broker not in _PRODUCERS:
+            if not _PRODUCERS:
+                from atexit import register
+                register(close_producers)
+            _PRODUCERS[broker] = Producer({"bootstrap.servers": broker})
+        return _PRODUCERS[broker]
+
+
+def close_producers(timeout: float = 10.0):
+    """Deliver any outstanding messages from, and then forget, all pooled producers
+
+    Returns
+    -------
+    A mapping of broker to the number of messages still undelivered at the timeout
+    """
+    with _POOL_LOCK:
+        producers = dict(_PRODUCERS)
+        _PRODUCERS.clear()
+    return {broker: producer.flush(timeout) for broker, producer in producers.items()}
+
+
+def forget_kafka_broker(broker: str | None = None):
+    """Drop the pooled AdminClient and cached topics for one, or every, broker"""
+    with _POOL_LOCK:
+        for b in ([broker] if broker is not None else list(_ADMIN_CLIENTS)):
+            _ADMIN_CLIENTS.pop(b, None)
+            _KNOWN_TOPICS.pop(b, None)
+
+
+def register_kafka_topics(
+        broker: str,
+        topics: list[str],
+        profiles: dict[str, TopicProfile] | None = None,
+        expand: bool = False,
+):
+    return register_kafka_topics_batch({broker: topics}, profiles, expand)[broker]
+
+
+def register_kafka_topics_batch(
+        requests: dict[str, list[str]],
+        profiles: dict[str, TopicProfile] | None = None,
+        expand: bool = False,
+):
+    """Ensure that topics exist on one or more brokers, creating missing topics concurrently
+
+    Topics already known to the (cached) broker metadata are reported as existing
+    without contacting the broker. Any others are created in a single request per
+    broker, and all requests are in flight before any result is waited on.
+
+    Parameters
+    ----------
+    requests: a mapping of broker to the list of topic names to register there
+    profiles: a mapping of topic name to the TopicProfile used to create it,
+              topics not included use the 'default' profile
+    expand:   increase the number of partitions of existing topics which have
+              fewer than their profile specifies
+
+    Returns
+    -------
+    A mapping of broker to a mapping of topic name to KafkaTopic result, or the
+    Kafka error code if creation failed.
+    """
+    from confluent_kafka.admin import NewTopic
+    from confluent_kafka.error import KafkaError
+    if profiles is None:
+        profiles = {}
+    default = TOPIC_PROFILES['default']
+    results: dict[str, dict] = {}
+    pending = {}
+    for broker, topics in requests.items():
+        results[broker] = {}
+        known = _KNOWN_TOPICS.get(broker)
+        if known is None or any(t not in known for t in topics):
+            # Another client may have created the topic since we last looked
+            known = known_kafka_topics(broker, refresh=True)
+        missing = [t for t in dict.fromkeys(topics) if t not in known]
+        results[broker].update({t: KafkaTopic.EXISTS for t in topics if t in known})
+        if expand:
+            grow = {t: profiles[t].partitions for t in topics
+                    if t in known and t in profiles and known[t] < profiles[t].partitions}
+            if grow:
+                results[broker].update(expand_kafka_topic_partitions(broker, grow))
+        if missing:
+            new_ts = [NewTopic(t,
+                               num_partitions=profiles.get(t, default).partitions,
+                               replication_factor=profiles.get(t, default).replication_factor,
+                               config=profiles.get(t, default).config())
+                      for t in missing]
+            pending[broker] = get_admin_client(broker).create_topics(new_ts)
+
+    for broker, futures in pending.items():
+        for topic, future in futures.items():
+            try:
+                future.result()
+                results[broker][topic] = KafkaTopic.CREATED
+                with _POOL_LOCK:
+                    _KNOWN_TOPICS.setdefault(broker, {})[topic] = profiles.get(topic, default).partitions
+            except Exception as e:
+                if e.args[0] == KafkaError.TOPIC_ALREADY_EXISTS:
+                    results[broker][topic] = KafkaTopic.EXISTS
+                else:
+                    results[broker][topic] = e.args[0]
+    return results
+
+
+def expand_kafka_topic_partitions(broker: str, partitions: dict[str, int]):
+    """Increase the number of partitions of existing topics
+
+    Kafka can not remove partitions, so topics which already have at least the
+    requested number are reported as existing without contacting the broker.
+
+    Parameters
+    ----------
+    broker:     the Kafka broker hosting the topics
+    partitions: a mapping of topic name to its required total number of partitions
+
+    Returns
+    -------
+    A mapping of topic name to KafkaTopic result, or the Kafka error code on failure
+    """
+    from confluent_kafka.admin import NewPartitions
+    known = known_kafka_topics(broker)
+    results: dict = {t: KafkaTopic.EXISTS for t, n in partitions.items() if known.get(t, 0) >= n}
+    grow = [NewPartitions(t, n) for t, n in partitions.items() if t not in results]
+    if not grow:
+        return results
+    for topic, future in get_admin_client(broker).create_partitions(grow).items():
         try:
             future.result()
-            results[topic] = KafkaTopic.CREATED
+            results[topic] = KafkaTopic.EXPANDED
+            with _POOL_LOCK:
+                _KNOWN_TOPICS.setdefault(broker, {})[topic] = partitions[topic]
         except Exception as e:
-            from confluent_kafka.error import KafkaError
-            if e.args[0] == KafkaError.TOPIC_ALREADY_EXISTS:
-                results[topic] = KafkaTopic.EXISTS
-            else:
-                results[topic] = e.args[0]
+            results[topic] = e.args[0]
     return results
 
 
 def register_topics():
+    from dataclasses import replace
     args = parse_kafka_topic_args()
-    results = register_kafka_topics(args.broker, args.topic)
+    profile = TOPIC_PROFILES[args.profile]
+    if args.partitions is not None:
+        profile = replace(profile, partitions=args.partitions)
+    profiles = {topic: profile for topic in args.topic}
+    results = register_kafka_topics(args.broker, args.topic, profiles, expand=args.expand)
     if not args.quiet:
         for topic, result in results.items():
             if result == KafkaTopic.CREATED:
                 print(f'Created topic {topic}')
             elif result == KafkaTopic.EXISTS:
                 print(f'Topic {topic} already exists')
+            elif result == KafkaTopic.EXPANDED:
+                print(f'Expanded topic {topic} to {profile.partitions} partitions')
             else:
                 print(f'Failed to register topic "{topic}"? {result}')
@@ -69,6 +69,96 @@ class EventFormationUnitConfig:
         return cls.from_dict(data)
 
 
+def reserve_udp_port(host: str = 'localhost') -> int:
+    """A UDP port which is currently free, as chosen by the operating system
+
+    Unlike a TCP port from `reserve`, the port is not held in TIME_WAIT, but the
+    OS chooses ephemeral ports in turn so it is unlikely to be reused soon.
+    """
+    import socket
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class EventFormationUnitShards:
+    """
+    How the readouts of one detector are shared among a pool of EFUs
+
+    Each simulation process sends its readouts to one shard, chosen by its index,
+    so the event formation for the detector is spread over as many processes.
+
+    Properties
+    ----------
+    name: the name of the detector EFU
+    host: the host to which readouts are sent
+    ports: the UDP readout port of each EFU in the pool
+    topics: the event topic of each EFU in the pool, which may all be the same
+    """
+    name: str
+    host: str
+    ports: list[int]
+    topics: list[str]
+
+    def port(self, shard: int) -> int:
+        """The readout port for a shard index, with indexes beyond the pool size wrapping around"""
+        return self.ports[shard % len(self.ports)]
+
+    def to_dict(self):
+        return {'name': self.name, 'host': self.host, 'ports': self.ports, 'topics': self.topics}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data['name'], data['host'], [int(p) for p in data['ports']], list(data['topics']))
+
+
+def save_efu_shards(path: str | Path, shards: list[EventFormationUnitShards]):
+    """Write the shard descriptions of every EFU pool to a JSON file, for the simulation side"""
+    from json import dump
+    with open(path, 'w') as f:
+        dump({x.name: x.to_dict() for x in shards}, f, indent=2)
+
+
+def load_efu_shards(path: str | Path) -> dict[str, EventFormationUnitShards]:
+    from json import load
+    with open(path) as f:
+        return {name: EventFormationUnitShards.from_dict(data) for name, data in load(f).items()}
+
+
+def efu_pool(config: EventFormationUnitConfig, count: int, per_topic: bool = False, host: str = 'localhost'
+             ) -> tuple[list[EventFormationUnitConfig], EventFormationUnitShards]:
+    """Configure a pool of EFUs for one detector, each listening at its own free UDP port
+
+    Parameters
+    ----------
+    config:    the configuration of a single EFU for the detector
+    count:     the number of EFUs in the pool
+    per_topic: if True, each EFU writes its events to a topic of its own, named for
+               its index in the pool; otherwise all share the configured topic, which
+               should then have at least `count` partitions, among which the Kafka
+               producer of each EFU distributes its messages
+    host:      the host at which the UDP ports must be free
+
+    Returns
+    -------
+    The configuration of each EFU in the pool, and how to shard readouts across them
+    """
+    from dataclasses import replace
+    if count < 1:
+        raise ValueError(f'An EFU pool needs at least one EFU, not {count}')
+    ports: list[int] = []
+    while len(ports) < count:
+        if (port := reserve_udp_port(host)) not in ports:
+            ports.append(port)
+    configs = []
+    for index, port in enumerate(ports):
+        topic = f'{config.topic}_{index}' if per_topic else config.topic
+        samples_topic = f'{topic}_samples' if per_topic else config.samples_topic
+        configs.append(replace(config, name=f'{config.name}{index}', port=port, topic=topic,
+                               samples_topic=samples_topic))
+    return configs, EventFormationUnitShards(config.name, host, ports, [c.topic for c in configs])
+
 
 @dataclass
 class EventFormationUnit(Manager):
@@ -124,6 +214,11 @@ class EventFormationUnit(Manager):
                 '--nohwcheck']
         return argv
 
+    def readiness_probe(self):
+        """Ready once the EFU accepts connections on its command port"""
+        from .readiness import PortProbe
+        return PortProbe(self.command)
+
     def finalize(self):
         import socket
         message = f"Check your system status manager whether {self.binary} is active."
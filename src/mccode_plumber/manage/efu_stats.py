@@ -0,0 +1,182 @@
+"""Poll the statistics counters of managed EFUs over their command ports
+
+An EFU answers `STAT_GET_COUNT` with the number of its counters, and `STAT_GET i`
+with the name and value of the i-th, counting from 1. One thread queries every
+EFU at a fixed interval, over a connection kept open to each, and computes the
+rate of change of each counter. Periodic summaries of packet, readout, event
+and drop rates are written with the managed processes' output, so throughput
+and loss can be followed without a graphite server.
+"""
+from __future__ import annotations
+
+import socket
+from io import BufferedReader
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from .efu import EventFormationUnit
+
+# Counters are summarised by the first of these categories whose keyword their name contains
+CATEGORIES = {
+    'drops': ('drop', 'error', 'overflow'),
+    'packets': ('packets',),
+    'readouts': ('readout',),
+    'events': ('event',),
+}
+
+
+def category(name: str) -> str | None:
+    """The summary category of a counter, by its name, or None if it has none"""
+    lower = name.lower()
+    for key, keywords in CATEGORIES.items():
+        if any(keyword in lower for keyword in keywords):
+            return key
+    return None
+
+
+class EFUCommandClient:
+    """One connection to an EFU command port, reopened after any failure
+
+    Each command is answered by a single newline-terminated reply, which may arrive
+    in any number of reads. A reply which is not the expected one, e.g., because an
+    earlier reply was not read, closes the connection so that the next starts afresh.
+    """
+    def __init__(self, port: int, host: str = 'localhost', timeout: float = 1.0):
+        self.address = host, port
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._reader: BufferedReader | None = None
+
+    def query(self, command: str) -> str:
+        if self._sock is None or self._reader is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+            self._reader = self._sock.makefile('rb')
+        try:
+            self._sock.sendall(bytes(command + '\n', 'utf-8'))
+            reply = self._reader.readline()
+        except OSError:
+            self.close()
+            raise
+        if not reply.endswith(b'\n'):
+            self.close()
+            raise ConnectionError(f'EFU at {self.address} closed the connection')
+        return str(reply, 'utf-8').strip()
+
+    def _expect(self, command: str, fields: int) -> list[str]:
+        """The fields of the reply to a command, which must repeat the command's first word"""
+        parts = self.query(command).split()
+        if len(parts) != fields or parts[0] != command.split()[0]:
+            self.close()
+            raise ValueError(f'Unexpected reply from EFU at {self.address} to {command}: {" ".join(parts)}')
+        return parts
+
+    def statistics(self) -> dict[str, int]:
+        """The name and value of every counter of the EFU"""
+        count = int(self._expect('STAT_GET_COUNT', 2)[1])
+        counters = {}
+        for index in range(1, count + 1):
+            _, name, value = self._expect(f'STAT_GET {index}', 3)
+            counters[name] = int(value)
+        return counters
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class EFUStatsCollector:
+    """Query the counters of EFUs periodically, from one thread, and report their rates
+
+    Parameters
+    ----------
+    efus:            the managed EFUs to poll
+    interval:        seconds between polls
+    report_interval: seconds between summaries written with the process output, or None for none
+
+    Properties
+    ----------
+    counters: the latest value of every counter, by EFU name
+    rates:    the change per second of every counter between the latest two polls, by EFU name
+    """
+    def __init__(self, efus, interval: float = 1.0, report_interval: float | None = 10.0):
+        self.efus: list[EventFormationUnit] = list(efus)
+        self.interval = interval
+        self.report_interval = report_interval
+        self.counters: dict[str, dict[str, int]] = {}
+        self.rates: dict[str, dict[str, float]] = {}
+        self._clients = {efu.name: EFUCommandClient(efu.command) for efu in self.efus}
+        self._polled: dict[str, float] = {}
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    def poll(self):
+        """Query every running EFU once, updating its counters and rates"""
+        for efu in self.efus:
+            if not efu.poll():
+                continue
+            try:
+                counters = self._clients[efu.name].statistics()
+            except (OSError, ValueError):
+                continue
+            now = monotonic()
+            with self._lock:
+                previous, previous_time = self.counters.get(efu.name), self._polled.get(efu.name)
+                if previous is not None and previous_time is not None and now > previous_time:
+                    # A counter which decreased belongs to a restarted EFU, and has no rate yet
+                    self.rates[efu.name] = {
+                        name: (value - previous[name]) / (now - previous_time)
+                        for name, value in counters.items() if previous.get(name, value + 1) <= value
+                    }
+                self.counters[efu.name] = counters
+                self._polled[efu.name] = now
+
+    def totals(self, name: str) -> dict[str, float]:
+        """The summed rate of the counters in each category for the named EFU"""
+        totals = {key: 0.0 for key in CATEGORIES}
+        with self._lock:
+            rates = dict(self.rates.get(name, {}))
+        for counter, rate in rates.items():
+            if (key := category(counter)) is not None:
+                totals[key] += rate
+        return totals
+
+    def summary(self, efu: EventFormationUnit) -> str:
+        totals = self.totals(efu.name)
+        rates = ', '.join(f'{totals[key]:.0f} {key}/s' for key in ('packets', 'readouts', 'events', 'drops'))
+        return f'{efu._pretty_name()} {rates}\n'
+
+    def report(self):
+        """Write a summary line for every EFU with rates, alongside the managed processes' output"""
+        from .manager import IOType
+        from .output import shared_output_reader
+        with self._lock:
+            names = set(self.rates)
+        texts = [self.summary(efu) for efu in self.efus if efu.name in names]
+        shared_output_reader().sink.write(IOType.stdout, texts)
+
+    def _run(self):
+        last_report = monotonic()
+        while not self._stopped.wait(self.interval):
+            self.poll()
+            if self.report_interval is not None and monotonic() - last_report >= self.report_interval:
+                self.report()
+                last_report = monotonic()
+
+    def start(self):
+        """Poll every interval, from a background thread, until stopped"""
+        if self._thread is None:
+            self.poll()
+            self._thread = Thread(target=self._run, name='efu-stats', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        for client in self._clients.values():
+            client.close()
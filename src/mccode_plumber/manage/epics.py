@@ -1,10 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from pathlib import Path
-from mccode_antlr.common import InstrumentParameter
+from typing import TYPE_CHECKING
 from .manager import Manager
 from .ensure import ensure_executable
 
+if TYPE_CHECKING:
+    from mccode_antlr.common import InstrumentParameter
+
 @dataclass
 class EPICSMailbox(Manager):
     """
@@ -31,3 +34,8 @@ class EPICSMailbox(Manager):
 
     def __run_command__(self) -> list[str]:
         return [self._command.as_posix(), '--prefix', self.prefix] + self.strings
+
+    def readiness_probe(self):
+        """Ready once the mailbox PVs can be read, tested with the one every mailbox serves"""
+        from .readiness import PVProbe
+        return PVProbe(f'{self.prefix}mcpl_filename')
@@ -21,6 +21,8 @@ class Forwarder(Manager):
     retrieve:   Retrieve values from Kafka at configuration (False == don't)
     verbosity:  Control if (Trace, Debug, Warning, Error, or Critical) messages
                 should be printed to STDOUT
+    update_period: The interval, in milliseconds, at which streams configured
+                as periodic are re-sent when their value does not change
 
     Note
     ----
@@ -34,13 +36,14 @@ class Forwarder(Manager):
     status: str | None = None
     retrieve: bool = False
     verbosity: str | None = None
+    update_period: int | None = None
     _command: Path = field(default_factory=lambda: Path('forwarder-launch'))
     _broker: str = field(default='localhost:9092')
     _config: str = field(default='ForwardConfig')
     _status: str = field(default='ForwardStatus')
 
     def __post_init__(self):
-        from mccode_plumber.kafka import register_kafka_topics, all_exist
+        from mccode_plumber.kafka import register_kafka_topics_batch, all_exist
         self._command =ensure_executable(self._command)
         if self.broker is None:
             self.broker = self._broker
@@ -56,12 +59,19 @@ class Forwarder(Manager):
         self._config = self.config
         self._status = self.status
 
+        requests: dict[str, list[str]] = {}
         for broker_topic in (self.config, self.status):
             b, t = broker_topic.split('/')
-            res = register_kafka_topics(b, [t])
+            requests.setdefault(b, []).append(t)
+        for res in register_kafka_topics_batch(requests).values():
             if not all_exist(res.values()):
                 raise RuntimeError(f'Missing Kafka topics? {res}')
 
+        if not self.retrieve:
+            # A new forwarder which does not retrieve its configuration forwards nothing
+            from mccode_plumber.forwarder import ForwarderRecord
+            ForwarderRecord(*self.config.split('/', 1)).clear()
+
 
     def __run_command__(self) -> list[str]:
         args: list[str] = [
@@ -74,8 +84,50 @@ class Forwarder(Manager):
             args.append('--skip-retrieval')
         if (v:=forwarder_verbosity(self.verbosity)) is not None:
             args.extend(['-v', v])
+        if self.update_period is not None:
+            args.extend(['--pv-update-period', str(self.update_period)])
         return args
 
+    def relaunched(self):
+        """Re-send the recorded streams to the restarted Forwarder, which does not retrieve them itself"""
+        if not self.retrieve:
+            from threading import Thread
+            Thread(target=self._restore_streams, name=f'{self.name}-restore', daemon=True).start()
+
+    def _restore_streams(self, timeout: float = 60.0, interval: float = 0.2):
+        from time import monotonic, sleep
+        from mccode_plumber.forwarder import ForwarderRecord, configure_forwarder
+        broker, topic = self._config.split('/', 1)
+        with ForwarderRecord.locked(broker, topic) as record:
+            pvs = list(record.pvs.values())
+            # The new process forwards nothing, whether or not the streams can be re-sent
+            record.pvs = {}
+        if not pvs:
+            return
+        # Configuration sent before the Forwarder subscribes to its topic would be missed
+        probe = self.readiness_probe()
+        end = monotonic() + timeout
+        try:
+            while not (ready := probe()) and self.poll() and monotonic() < end:
+                sleep(interval)
+        finally:
+            if hasattr(probe, 'close'):
+                probe.close()
+        if not ready:
+            print(f'{self.name} was not ready after restarting, {len(pvs)} streams are no longer forwarded')
+            return
+        try:
+            configure_forwarder(pvs, self._config)
+        except RuntimeError as e:
+            print(f'{self.name} restarted, but its {len(pvs)} streams could not be re-sent: {e}')
+            return
+        print(f'{self.name} restarted, {len(pvs)} streams re-sent')
+
+    def readiness_probe(self):
+        """Ready once the Forwarder publishes a status message"""
+        from .readiness import StatusMessageProbe
+        return StatusMessageProbe(*self._status.split('/', 1))
+
 
 def forwarder_verbosity(v):
     if isinstance(v, str):
@@ -0,0 +1,171 @@
+"""Capture managed process output to rotating files, and limit what reaches the terminal
+
+Every line a managed process writes can be recorded, unstyled, with the time it
+was read, its stream, and its triage level. Files are written by a background
+thread, which flushes in batches and rotates each file once it reaches a size
+limit, optionally compressing the rotated files.
+
+Independently, the lines printed to the terminal for a process can be limited to
+a rate, or disabled, so that a chatty service costs nothing to style and print.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from queue import SimpleQueue, Empty
+from threading import Lock, Thread
+from time import monotonic, time
+
+from .manager import IOType
+
+
+def _timestamp(seconds: float) -> str:
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec='milliseconds')
+
+
+class RotatingLog:
+    """Lines of output from one process, written to size-limited files by a background thread
+
+    Each line is recorded as `{time} {stream} {level} {line}`, with the ISO 8601 UTC
+    time at which it was read. Once the file exceeds max_bytes it is renamed with
+    the suffix '.1', or compressed to '.1.gz', and earlier rotated files have their
+    numbers increased; only the newest backups are kept.
+
+    Parameters
+    ----------
+    path:           the file to write, which is appended to if it exists
+    max_bytes:      the size at which the file is rotated, or None to never rotate
+    backups:        the number of rotated files kept
+    compress:       whether rotated files are compressed with gzip
+    flush_interval: the longest time, in seconds, between writing lines and flushing them
+    """
+    def __init__(self, path: str | Path, max_bytes: int | None = 10 * 1024 * 1024, backups: int = 5,
+                 compress: bool = False, flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.closed = False
+        self.queue: SimpleQueue[tuple[float, IOType, str, str] | None] = SimpleQueue()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open('ab')
+        self._size = self._file.tell()
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name=f'log-{self.path.name}', daemon=True)
+        self._thread.start()
+
+    def write(self, io_type: IOType, level: str, line: str):
+        """Queue a line for writing, with the current time; lines written after closing are dropped"""
+        if not self.closed:
+            self.queue.put((time(), io_type, level, line))
+
+    def _backup(self, number: int) -> Path:
+        return self.path.with_name(f'{self.path.name}.{number}{".gz" if self.compress else ""}')
+
+    def _rotate(self):
+        import shutil
+        self._file.close()
+        if self.backups > 0:
+            for number in range(self.backups - 1, 0, -1):
+                if self._backup(number).exists():
+                    self._backup(number).replace(self._backup(number + 1))
+            if self.compress:
+                import gzip
+                with self.path.open('rb') as source, gzip.open(self._backup(1), 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                self.path.unlink()
+            else:
+                self.path.replace(self._backup(1))
+        else:
+            self.path.unlink()
+        self._file = self.path.open('ab')
+        self._size = 0
+
+    def _write(self, items: list[tuple[float, IOType, str, str]]):
+        chunk = []
+        for t, io_type, level, line in items:
+            encoded = f'{_timestamp(t)} {io_type.name} {level} {line}'.encode(errors='replace')
+            chunk.append(encoded)
+            self._size += len(encoded)
+            if self.max_bytes is not None and self._size >= self.max_bytes:
+                self._file.write(b''.join(chunk))
+                chunk = []
+                self._rotate()
+        self._file.write(b''.join(chunk))
+
+    def _run(self):
+        dirty = False
+        last_flush = monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval if dirty else None)
+            except Empty:
+                # Nothing more arrived, so flush what has been written
+                self._file.flush()
+                dirty, last_flush = False, monotonic()
+                continue
+            items = []
+            while item is not None:
+                items.append(item)
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+            if items:
+                self._write(items)
+                dirty = True
+            if item is None:
+                self._file.close()
+                return
+            if monotonic() - last_flush >= self.flush_interval:
+                self._file.flush()
+                dirty, last_flush = False, monotonic()
+
+    def close(self):
+        """Write all queued lines, then close the file"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.queue.put(None)
+        self._thread.join()
+
+
+class LineThrottle:
+    """Limit the rate at which lines are printed, counting those which are not
+
+    Parameters
+    ----------
+    rate:  the most lines per second, on average, or None for no limit; 0 prints no lines
+    burst: the most lines printed at once, after a quiet period; by default one second's worth
+    """
+    def __init__(self, rate: float | None = None, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 0.0)
+        self.suppressed = 0
+        self._tokens = self.burst
+        self._last = monotonic()
+
+    @property
+    def disabled(self) -> bool:
+        return self.rate is not None and self.rate <= 0
+
+    def allow(self) -> bool:
+        """Whether to print one more line now"""
+        if self.rate is None:
+            return True
+        if self.rate > 0:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+        self.suppressed += 1
+        return False
+
+    def take_suppressed(self) -> int:
+        """The number of lines not printed since this was last called"""
+        suppressed, self.suppressed = self.suppressed, 0
+        return suppressed
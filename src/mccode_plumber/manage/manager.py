@@ -1,20 +1,112 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING
 from subprocess import Popen, PIPE
-from threading import Thread
 from enum import Enum
+from re import Pattern
 from colorama import Fore, Back, Style
 from colorama.ansi import AnsiStyle
 
+if TYPE_CHECKING:
+    from .logs import LineThrottle, RotatingLog
+
 
 class IOType(Enum):
     stdout = 1
     stderr = 2
 
 
+def _first_characters(items, flags: int) -> set[str] | None:
+    """The characters which can start a match of parsed regular expression items, if known
+
+    Any exception raised, e.g., by a change to the private re._constants, is handled by _lookahead
+    """
+    import re
+    from re import _constants as c  # type: ignore[attr-defined]
+    chars: set[str] | None
+    for op, av in items:
+        if op is c.AT:
+            continue  # zero-width, e.g., ^ or \b
+        if op is c.LITERAL:
+            chars = {chr(av)}
+        elif op is c.IN:
+            chars = in_chars = set()
+            for in_op, in_av in av:
+                if in_op is c.LITERAL:
+                    in_chars.add(chr(in_av))
+                elif in_op is c.RANGE and in_av[1] - in_av[0] < 64:
+                    in_chars.update(chr(x) for x in range(in_av[0], in_av[1] + 1))
+                else:
+                    return None
+        elif op is c.SUBPATTERN:
+            chars = _first_characters(av[-1], flags | av[1])
+        elif op is c.BRANCH:
+            chars = branches_chars = set()
+            for branch in av[1]:
+                if (branch_chars := _first_characters(branch, flags)) is None:
+                    return None
+                branches_chars |= branch_chars
+        elif op in (c.MAX_REPEAT, c.MIN_REPEAT) and av[0] > 0:
+            chars = _first_characters(av[2], flags)
+        else:
+            return None
+        if chars is not None and flags & re.IGNORECASE:
+            chars = {x for char in chars for x in (char, char.lower(), char.upper())}
+        return chars
+    return None
+
+
+def _lookahead(patterns: list[str], flags: int) -> str:
+    """A lookahead for the characters which can start a match of any of the patterns
+
+    Python's regular expression engine tries every alternative at every position
+    in a line, which preceding the alternatives with this lookahead avoids at most
+    positions. If the first characters of any pattern can not be determined, this
+    is empty. The patterns are parsed by the private re._parser module, so if that
+    is missing or has changed, e.g., in another Python version, this is also empty.
+    """
+    import re
+    chars: set[str] = set()
+    try:
+        from re import _parser  # type: ignore[attr-defined]
+        for pattern in patterns:
+            parsed = _parser.parse(pattern, flags)
+            if (pattern_chars := _first_characters(list(parsed), parsed.state.flags)) is None:
+                chars.clear()
+                break
+            chars |= pattern_chars
+    except Exception:
+        chars.clear()
+    return f'(?=[{"".join(re.escape(x) for x in sorted(chars))}])' if chars else ''
+
+
+def _alternatives(patterns: list[str]) -> str:
+    return '|'.join(f'(?:{pattern})' for pattern in patterns)
+
+
 @dataclass
 class Triage:
-    level: str = field(default=lambda: 'info')
+    """
+    Identify the severity level of process output lines, filter, and style them
+
+    Properties
+    ----------
+    level: str
+        The least severe level which is shown, lines of later levels are filtered
+    ignore: list[str]
+        Lines containing any of these (case-sensitive) keywords are always filtered
+    patterns: dict[str, list[str]]
+        Case-insensitive regular expressions identifying each level, ordered from
+        most to least severe; the first level with any matching pattern is used
+    styles: dict[str, str]
+        ANSI styles to apply to lines of each level, or to unidentified lines
+
+    The patterns and ignore keywords are compiled once, when the Triage is made;
+    call `compile` after modifying them. Since all patterns are combined into one
+    expression, they can not use back-references to their own groups.
+    """
+    level: str = 'info'
     ignore: list[str] = field(default_factory=list)
     patterns: dict[str, list[str]] = field(default_factory=lambda: {
         'critical': [r'\bcritical\b', r'^cri'],
@@ -35,29 +127,110 @@ class Triage:
         'debug': Fore.WHITE + Style.BRIGHT,
         'default': Fore.RESET,
     })
+    _classifier: Pattern | None = field(default=None, init=False, repr=False, compare=False)
+    _level_classifiers: list[tuple[str, Pattern]] = field(default_factory=list, init=False, repr=False,
+                                                          compare=False)
+    _group_ranks: dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _ignorer: Pattern | None = field(default=None, init=False, repr=False, compare=False)
+    _filtered: dict[str, bool] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.compile()
+
+    def compile(self):
+        """Compile the patterns and ignore keywords, and tabulate which levels are filtered"""
+        import re
+        flags = re.IGNORECASE
+        levels = [(level, patterns) for level, patterns in self.patterns.items() if patterns]
+        # One search for any pattern of any level, with a named group per level, finds the
+        # level of the leftmost match; per-level searches then check only the preceding levels
+        self._level_classifiers = [
+            (level, re.compile(f'{_lookahead(patterns, flags)}(?:{_alternatives(patterns)})', flags))
+            for level, patterns in levels
+        ]
+        self._group_ranks = {f'level{i}': i for i in range(len(levels))}
+        groups = '|'.join(f'(?P<level{i}>{_alternatives(patterns)})' for i, (_, patterns) in enumerate(levels))
+        lookahead = _lookahead([pattern for _, patterns in levels for pattern in patterns], flags)
+        self._classifier = re.compile(f'{lookahead}(?:{groups})', flags) if levels else None
+        self._ignorer = re.compile('|'.join(re.escape(kw) for kw in self.ignore)) if self.ignore else None
+        # Levels are ranked by their order in patterns, with unidentified lines ranked before all
+        rank = {level: i for i, level in enumerate(self.patterns)}
+        threshold = rank.get(self.level, -1)
+        self._filtered = {level: rank.get(level, -1) > threshold for level in (*self.patterns, 'default')}
+
+    def classify(self, line: str) -> str:
+        """Return the first level with a pattern matching the line, or 'default' if none match"""
+        if self._classifier is None or (match := self._classifier.search(line)) is None:
+            return 'default'
+        # Each level group encloses any groups of its patterns, so is the last to close
+        rank = self._group_ranks[match.lastgroup or '']
+        for level, classifier in self._level_classifiers[:rank]:
+            if classifier.search(line):
+                return level
+        return self._level_classifiers[rank][0]
+
+    def ignores(self, line: str) -> bool:
+        """Whether the line contains an ignored keyword"""
+        return self._ignorer is not None and self._ignorer.search(line) is not None
 
     def _filtered_level(self, level: str) -> bool:
-        def _level_value(v: str):
-            for i, lvl in enumerate(self.patterns.keys()):
-                if v == lvl:
-                    return i
-            return -1
-        return _level_value(level) > _level_value(self.level)
+        return self._filtered.get(level, self._filtered['default'])
 
     def _style_line(self, level: str, line: str):
         return self.styles.get(level, '') + line + Style.RESET_ALL
 
     def __call__(self, line: str) -> tuple[bool, str | None]:
-        import re
         # If the line contains an ignored keyword, ignore it.
-        if any(kw in line for kw in self.ignore):
+        if self.ignores(line):
             return True, None
-        # Check if we can identify the status level of this message
-        for level, patterns in self.patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    return self._filtered_level(level), self._style_line(level, line)
-        return self._filtered_level('default'), self._style_line('default', line)
+        level = self.classify(line)
+        return self._filtered_level(level), self._style_line(level, line)
+
+
+class RestartMode(Enum):
+    never = 'never'
+    on_failure = 'on-failure'
+    always = 'always'
+
+
+@dataclass
+class RestartPolicy:
+    """
+    Whether, how often, and how soon to restart a managed process after it exits
+
+    Properties
+    ----------
+    mode: RestartMode
+        Never restart, restart only after a non-zero exit status, or always restart
+    max_restarts: int | None
+        The most times the process is restarted, or None for no limit
+    backoff: float
+        Seconds to wait before the first restart, doubled for each later restart
+    max_backoff: float
+        The longest wait before any restart, in seconds
+    count: int
+        How many times the process has been restarted
+    downtime: float
+        The total seconds between the process exiting and being restarted
+    """
+    mode: RestartMode = RestartMode.never
+    max_restarts: int | None = 5
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    count: int = 0
+    downtime: float = 0.0
+
+    def wanted(self, returncode: int | None) -> bool:
+        """Whether a process which exited with returncode should be restarted"""
+        if self.max_restarts is not None and self.count >= self.max_restarts:
+            return False
+        if self.mode == RestartMode.always:
+            return True
+        return self.mode == RestartMode.on_failure and returncode != 0
+
+    def delay(self) -> float:
+        """Seconds to wait before the next restart"""
+        return min(self.max_backoff, self.backoff * 2 ** self.count)
 
 
 @dataclass
@@ -74,17 +247,26 @@ class Manager:
     _triage: Triage
         An object to filter status messages and identify severity levels
         applying its own message styling based on the identified level
-    _process:   a subprocess.Popen instance
-    _stdout_thread: Thread
-    _stderr_thread: Thread
+    restart: RestartPolicy
+        Whether the process is restarted after it exits, and how often it has been
+    log: RotatingLog | None
+        If provided, every line of output which is not ignored is recorded here,
+        unstyled and whatever its level
+    terminal: LineThrottle
+        Limits the rate at which output lines are printed, or disables printing
+    _process:   a subprocess.Popen instance, whose output pipes are read by the
+                shared reader of all managed processes' output
+    _output_chars: the number of characters of output read from each pipe, over all restarts
     """
     name: str
     style: AnsiStyle
     triage: Triage
+    restart: RestartPolicy
+    log: RotatingLog | None
+    terminal: LineThrottle
     _process: Popen | None
-    _stdout_thread: Thread | None
-    _stderr_thread: Thread | None
     _name_padding: int
+    _output_chars: dict[IOType, int]
 
     def __run_command__(self) -> list[str]:
         return []
@@ -92,6 +274,14 @@ class Manager:
     def finalize(self):
         pass
 
+    def relaunched(self):
+        """Called after the process is restarted, to restore any state the new process lacks"""
+        pass
+
+    def readiness_probe(self):
+        """A callable returning whether the service is ready for use; by default, once it has started"""
+        return lambda: True
+
     @classmethod
     def fieldnames(cls) -> list[str]:
         from dataclasses import fields
@@ -109,35 +299,22 @@ class Manager:
         padding = ' ' * self.name_padding
         return f'{self.style}{self.name}:{Style.RESET_ALL}{padding}'
 
-    def _read_stream(self, stream, io_type: IOType):
-        """Read lines from stream and print them until EOF.
-
-        This replaces the previous behaviour of sending lines over a
-        multiprocessing Connection. Printing directly from the reader
-        threads is sufficient because the manager previously only used
-        the connection to relay subprocess stdout/stderr back to the
-        parent process for display.
-        """
-        try:
-            for line in iter(stream.readline, ''):
-                if not line:
-                    break
-                ignored, line = self.triage(line)
-                if ignored:
-                    continue
-                formatted = f'{self._pretty_name()} {line}'
-                if io_type == IOType.stdout:
-                    print(formatted, end='')
-                else:
-                    from sys import stderr
-                    print(formatted, file=stderr, end='')
-        except ValueError:
-            pass  # stream closed
-        finally:
-            try:
-                stream.close()
-            except Exception:
-                pass
+    def _handle_line(self, io_type: IOType, line: str) -> str | None:
+        """Triage and log one line of output, returning it styled and prefixed with the name to print, if any"""
+        self._output_chars[io_type] += len(line)
+        if self.log is None and self.terminal.disabled:
+            return None
+        if self.triage.ignores(line):
+            return None
+        level = self.triage.classify(line)
+        if self.log is not None:
+            self.log.write(io_type, level, line)
+        if self.triage._filtered_level(level) or not self.terminal.allow():
+            return None
+        styled = f'{self._pretty_name()} {self.triage._style_line(level, line)}'
+        if suppressed := self.terminal.take_suppressed():
+            styled = f'{self._pretty_name()} ... {suppressed} lines not shown\n{styled}'
+        return styled
 
     @classmethod
     def start(cls, **config):
@@ -145,55 +322,93 @@ class Manager:
         kwargs = {k: config[k] for k in names if k in config}
         if any(k not in names for k in config):
             raise ValueError(f'{config} expected to contain only {names}')
-        for p in ('_process', '_stdout_thread', '_stderr_thread'):
-            if p not in kwargs:
-                kwargs[p] = None
+        if '_process' not in kwargs:
+            kwargs['_process'] = None
         if 'name' not in kwargs:
             kwargs['name'] = 'Managed process'
         if 'style' not in kwargs:
             kwargs['style'] = Fore.WHITE + Back.BLACK
         if 'triage' not in kwargs:
             kwargs['triage'] = Triage()
+        if 'restart' not in kwargs:
+            kwargs['restart'] = RestartPolicy()
+        if 'log' not in kwargs:
+            kwargs['log'] = None
+        if 'terminal' not in kwargs:
+            from .logs import LineThrottle
+            kwargs['terminal'] = LineThrottle()
         if '_name_padding' not in kwargs:
             kwargs['_name_padding'] = 0
+        if '_output_chars' not in kwargs:
+            kwargs['_output_chars'] = {IOType.stdout: 0, IOType.stderr: 0}
 
         manager = cls(**kwargs)
+        manager._launch()
+        return manager
 
-        argv = manager.__run_command__()
+    def _launch(self):
+        argv = self.__run_command__()
         shell = isinstance(argv, str)
         # announce start directly instead of sending via a Connection
         print(f'Starting {argv if shell else " ".join(argv)}')
 
-        manager._process = Popen(
-            argv, shell=shell, stdout=PIPE, stderr=PIPE, bufsize=1,
-            universal_newlines=True,
-        )
-        manager._stdout_thread = Thread(
-            target=manager._read_stream,
-            args=(manager._process.stdout, IOType.stdout),
-            daemon=True,
-        )
-        manager._stderr_thread = Thread(
-            target=manager._read_stream,
-            args=(manager._process.stderr, IOType.stderr),
-            daemon=True,
-        )
-        manager._stdout_thread.start()
-        manager._stderr_thread.start()
-        return manager
+        # Unbuffered binary pipes, which the shared reader splits into lines itself
+        self._process = Popen(argv, shell=shell, stdout=PIPE, stderr=PIPE, bufsize=0)
+        from .output import shared_output_reader
+        reader = shared_output_reader()
+        reader.add(self._process.stdout, IOType.stdout, partial(self._handle_line, IOType.stdout), self.name)
+        reader.add(self._process.stderr, IOType.stderr, partial(self._handle_line, IOType.stderr), self.name)
+
+    def relaunch(self, downtime: float = 0.0):
+        """Run the command again after the process exited, counting the restart and its downtime"""
+        if self.poll():
+            raise RuntimeError(f'{self.name} is still running')
+        self.restart.count += 1
+        self.restart.downtime += downtime
+        self._launch()
+        self.relaunched()
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """Finalize and terminate the process, killing it if it has not exited after timeout seconds
 
-    def stop(self):
+        Returns
+        -------
+        Whether the process exited without being killed
+        """
+        from subprocess import TimeoutExpired
+        from time import monotonic
+        deadline = None if timeout is None else monotonic() + timeout
+        graceful = True
         self.finalize()
         if self._process:
             self._process.terminate()
-            self._process.wait()
+            try:
+                self._process.wait(None if deadline is None else max(0.0, deadline - monotonic()))
+            except TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+                graceful = False
+            self._wait_for_output()
+        if self.log is not None:
+            self.log.close()
+        return graceful
+
+    def _wait_for_output(self, timeout: float = 1.0):
+        """Wait until the shared reader has read all output of the exited process, and closed its pipes"""
+        from time import monotonic, sleep
+        if self._process is None:
+            return
+        pipes = [pipe for pipe in (self._process.stdout, self._process.stderr) if pipe is not None]
+        end = monotonic() + timeout
+        while not all(pipe.closed for pipe in pipes) and monotonic() < end:
+            sleep(0.01)
 
     def poll(self):
         """Check whether the managed process is still running.
 
         Previously this drained and printed any messages received over a
-        multiprocessing Connection. Reader threads now handle printing,
-        so poll only needs to report process liveness.
+        multiprocessing Connection. The shared output reader now handles
+        printing, so poll only needs to report process liveness.
         """
         if not self._process:
             return False
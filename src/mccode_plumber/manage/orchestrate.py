@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import NamedTuple, Reversible
 from mccode_antlr.common import InstrumentParameter
 from mccode_antlr.instr import Instr
 from mccode_plumber.manage import ensure_readable_file, ensure_writable_file, ensure_executable
@@ -15,6 +16,11 @@ TOPICS = {
     'command': 'WriterCommand',
     'pool': 'WriterPool',
 }
+# The Kafka topic profile, from mccode_plumber.kafka.TOPIC_PROFILES, used per topic role
+ROLE_PROFILES = {
+    'event': 'events',
+    'monitor': 'monitor',
+}
 PREFIX = 'mcstas:'
 
 def guess_instr_config(name: str) -> Path:
@@ -32,14 +38,45 @@ def guess_instr_efu(name: str) -> Path:
     return ensure_executable(Path(guess))
 
 
-def register_topics(broker: str, topics: list[str]):
+def register_topics(broker: str, topics: list[str], profiles: dict | None = None, expand: bool = False):
     """Ensure that topics are registered in the Kafka broker."""
     from mccode_plumber.kafka import register_kafka_topics, all_exist
-    res = register_kafka_topics(broker, topics)
+    res = register_kafka_topics(broker, topics, profiles, expand)
     if not all_exist(res.values()):
         raise RuntimeError(f'Missing Kafka topics? {res}')
 
 
+def topic_profiles(roles: dict[str, str], partitions: dict[str, int | None] | None = None):
+    """Select the Kafka TopicProfile for each topic from its role
+
+    Parameters
+    ----------
+    roles:      a mapping of role, as in TOPICS and ROLE_PROFILES, to topic name
+    partitions: optional per-role overrides of the profile number of partitions
+    """
+    from dataclasses import replace
+    from mccode_plumber.kafka import TOPIC_PROFILES
+    profiles = {}
+    for role, topic in roles.items():
+        profile = TOPIC_PROFILES[ROLE_PROFILES.get(role, 'default')]
+        if partitions is not None and (count := partitions.get(role)) is not None:
+            profile = replace(profile, partitions=count)
+        profiles[topic] = profile
+    return profiles
+
+
+def pooled_partitions(partitions: int | None, pool: int) -> int:
+    """The partitions of an event topic shared by a pool of EFUs, at least one per EFU
+
+    Parameters
+    ----------
+    partitions: the requested number of partitions, or None for that of the 'event' role profile
+    pool:       the number of EFUs writing to the topic
+    """
+    from mccode_plumber.kafka import TOPIC_PROFILES
+    return max(partitions or TOPIC_PROFILES[ROLE_PROFILES['event']].partitions, pool)
+
+
 def augment_structure(
         parameters: tuple[InstrumentParameter,...],
         structure: dict,
@@ -121,31 +158,78 @@ def start_writer(start_time: datetime,
     return job_id, success
 
 
+class StreamRecord(NamedTuple):
+    """A Kafka stream found in a NeXus structure
+
+    Properties
+    ----------
+    topic:  the Kafka topic of the stream
+    source: the Kafka source name of the stream
+    path:   the slash-separated names of the groups containing the stream
+    module: the flatbuffer module of the stream, if known
+    """
+    topic: str
+    source: str
+    path: str
+    module: str | None
+
+
+def iter_streams(data: dict | list | tuple):
+    """Traverse a loaded JSON object, yielding a StreamRecord for every stream found.
+
+    The traversal uses an explicit stack, so arbitrarily deep structures can be
+    searched without hitting the recursion limit. Entries are yielded in
+    document order and duplicated streams are yielded once per occurrence.
+    """
+    stack: list[tuple[object, str, str | None]] = [(data, '', None)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        obj, path, module = pop()
+        values: Reversible[object]
+        if isinstance(obj, dict):
+            # A NeXus group contributes its name to the path of its children
+            if 'children' in obj and 'name' in obj:
+                path = f'{path}/{obj["name"]}'
+            # A module-stream holds its topic and source in its 'config' child
+            module = obj.get('module', module)
+            if 'topic' in obj and 'source' in obj:
+                yield StreamRecord(obj['topic'], obj['source'], path, module)
+            values = obj.values()
+        elif isinstance(obj, (list, tuple)):
+            values = obj
+        else:
+            continue
+        # Push in reverse so that entries are popped in document order
+        for value in reversed(values):
+            if isinstance(value, (dict, list, tuple)):
+                push((value, path, module))
+
+
+def index_streams_by_topic(data: dict | list | tuple) -> dict[str, list[StreamRecord]]:
+    """Group the streams of a loaded JSON object by their Kafka topic.
+
+    Each (topic, source) pair is only included once, at its first location.
+    """
+    index: dict[str, list[StreamRecord]] = {}
+    seen: set[tuple[str, str]] = set()
+    for record in iter_streams(data):
+        if (record.topic, record.source) not in seen:
+            seen.add((record.topic, record.source))
+            index.setdefault(record.topic, []).append(record)
+    return index
+
+
 def get_stream_pairs_list(data: list | tuple):
-    topics = set()
-    for entry in data:
-        if isinstance(entry, dict):
-            topics.update(get_stream_pairs_dict(entry))
-        elif isinstance(entry, (list, tuple)):
-            topics.update(get_stream_pairs_list(entry))
-    return topics
+    return {(r.topic, r.source) for r in iter_streams(data)}
 
 
 def get_stream_pairs_dict(data: dict):
-    topics = set()
-    if all(k in data for k in ('topic', 'source')):
-        topics.add((data['topic'], data['source']))
-    for k, v in data.items():
-        if isinstance(v, dict):
-            topics.update(get_stream_pairs_dict(v))
-        elif isinstance(v, (list, tuple)):
-            topics.update(get_stream_pairs_list(list(v)))
-    return topics
+    return {(r.topic, r.source) for r in iter_streams(data)}
 
 
 def get_stream_pairs(data: dict) -> list[tuple[str, str]]:
     """Traverse a loaded JSON object and return the found list of (topic, source) pairs."""
-    return list(get_stream_pairs_dict(data))
+    return [(r.topic, r.source) for records in index_streams_by_topic(data).values() for r in records]
 
 
 def load_file_json(file: str | Path):
@@ -222,9 +306,35 @@ def make_services_parser():
     # No need to specify the broker, or monitor source or topic names
     a('-b', '--broker', type=str, default=None, help='Kafka broker for all services', metavar='address:port')
     a('--efu', type=efu_parameter, action='append', default=None, help='Configuration of one EFU, repeatable', metavar='name,calibration,config,port')
+    a('--efu-pool', type=int, default=1, help='Number of EFUs started for each detector, at free UDP ports')
+    a('--efu-topics', type=str, default='partition', choices=('partition', 'topic'),
+      help='Whether pooled EFUs share a topic, with at least as many partitions as EFUs, or have a topic each')
+    a('--efu-shards', type=str, default=None, help='Where to write the EFU pool readout ports, for mp-nexus-splitrun',
+      metavar='FILE')
     a('--writer-working-dir', type=str, default=None, help='Working directory for kafka-to-nexus')
     a('--writer-verbosity', type=str, default=None, help='Verbose output type (trace, debug, warning, error, critical)')
     a('--forwarder-verbosity', type=str, default=None,  help='Verbose output type (trace, debug, warning, error, critical)')
+    a('--event-partitions', type=int, default=None, help='Number of partitions for event topics, existing topics are expanded')
+    a('--forwarder-update-period', type=int, default=None, help='Interval for periodic parameter updates', metavar='ms')
+    a('--ready-timeout', type=float, default=60.0, help='Seconds to wait for all services to be ready', metavar='s')
+    a('--restart', type=str, default='never', choices=('never', 'on-failure', 'always'),
+      help='Whether to restart services which exit')
+    a('--max-restarts', type=int, default=5, help='Most restarts of each service, negative for no limit')
+    a('--restart-backoff', type=float, default=1.0, help='Seconds before a first restart, doubled for each later one',
+      metavar='s')
+    a('--log-dir', type=str, default=None, help='Directory for a log file of the output of each service')
+    a('--log-max-bytes', type=int, default=10 * 1024 * 1024, help='Size at which each log file is rotated',
+      metavar='bytes')
+    a('--log-backups', type=int, default=5, help='Number of rotated log files kept for each service')
+    a('--log-compress', action='store_true', help='Compress rotated log files with gzip')
+    a('--terminal-rate', type=float, default=None,
+      help='Most lines per second printed for each service, 0 prints none', metavar='lines/s')
+    a('--stop-timeout', type=float, default=10.0, help='Seconds for each service to exit before it is killed',
+      metavar='s')
+    a('--efu-stats', type=float, default=None,
+      help='Seconds between summaries of EFU packet, readout, event and drop rates', metavar='s')
+    a('--sample-interval', type=float, default=None,
+      help='Seconds between samples of the resource use of each service, summarised at exit', metavar='s')
     return parser
 
 
@@ -239,6 +349,23 @@ def services():
         'work': args.writer_working_dir,
         'verbosity_writer': args.writer_verbosity,
         'verbosity_forwarder': args.forwarder_verbosity,
+        'event_partitions': args.event_partitions,
+        'forwarder_update_period': args.forwarder_update_period,
+        'ready_timeout': args.ready_timeout,
+        'restart': args.restart,
+        'max_restarts': args.max_restarts if args.max_restarts >= 0 else None,
+        'restart_backoff': args.restart_backoff,
+        'log_dir': args.log_dir,
+        'log_max_bytes': args.log_max_bytes,
+        'log_backups': args.log_backups,
+        'log_compress': args.log_compress,
+        'terminal_rate': args.terminal_rate,
+        'sample_interval': args.sample_interval,
+        'stop_timeout': args.stop_timeout,
+        'efu_pool': args.efu_pool,
+        'efu_topics': args.efu_topics,
+        'efu_shards': args.efu_shards,
+        'efu_stats': args.efu_stats,
     }
     load_in_wait_load_out(**kwargs)
 
@@ -252,58 +379,125 @@ def load_in_wait_load_out(
         manage: bool = True,
         verbosity_writer: str | None = None,
         verbosity_forwarder: str | None = None,
+        event_partitions: int | None = None,
+        forwarder_update_period: int | None = None,
+        ready_timeout: float | None = 60.0,
+        restart: str = 'never',
+        max_restarts: int | None = 5,
+        restart_backoff: float = 1.0,
+        log_dir: str | None = None,
+        log_max_bytes: int | None = 10 * 1024 * 1024,
+        log_backups: int = 5,
+        log_compress: bool = False,
+        terminal_rate: float | None = None,
+        sample_interval: float | None = None,
+        stop_timeout: float | None = 10.0,
+        efu_pool: int = 1,
+        efu_topics: str = 'partition',
+        efu_shards: str | None = None,
+        efu_stats: float | None = None,
     ):
         import signal
-        from time import sleep
+        from functools import partial
         from colorama import Fore, Back, Style
         from mccode_plumber.manage import (
             EventFormationUnit, EPICSMailbox, Forwarder, KafkaToNexus
         )
+        from mccode_plumber.manage.supervise import supervise, ServiceShutdown
+        from mccode_plumber.manage.readiness import ServiceStartup
         from mccode_plumber.manage.forwarder import forwarder_verbosity
         from mccode_plumber.manage.writer import writer_verbosity
-        from mccode_plumber.manage.manager import Triage
+        from mccode_plumber.manage.manager import Triage, RestartMode, RestartPolicy
+
+        from mccode_plumber.manage.logs import LineThrottle, RotatingLog
+        from mccode_plumber.manage.resources import ResourceSampler
+        from mccode_plumber.manage.efu_stats import EFUStatsCollector
+        from mccode_plumber.manage.efu import efu_pool as pool, save_efu_shards
+
+        def restart_policy():
+            # Each service counts its own restarts
+            return RestartPolicy(RestartMode(restart), max_restarts, restart_backoff)
+
+        def output(name: str):
+            # Each service writes its own log file, and is throttled independently
+            log = None if log_dir is None else \
+                RotatingLog(Path(log_dir) / f'{name}.log', log_max_bytes, log_backups, log_compress)
+            return {'log': log, 'terminal': LineThrottle(terminal_rate)}
+
+        # Resolve the EFUs first, since each may need a topic of its own
+        if manage and efu is None:
+            data = {
+                'name': instr_name,
+                'binary': guess_instr_efu(instr_name),
+                'config': guess_instr_config(name=instr_name),
+                'calibration': guess_instr_calibration(name=instr_name),
+                'topic': TOPICS['event'],
+                'port': 9000
+            }
+            if any('port' in p.name for p in instr_parameters):
+                from mccode_antlr.common.expression import DataType
+                port_parameter = next(
+                    p for p in instr_parameters if 'port' in p.name)
+                if port_parameter.value.has_value and port_parameter.value.data_type == DataType.int:
+                    # the instrument parameter has a default, which is an integer
+                    data['port'] = port_parameter.value.value
+            efu = [EventFormationUnitConfig.from_dict(data)]
+        if manage and efu and efu_pool > 1:
+            # Replace each EFU by a pool, and describe how the simulation should share readouts among them
+            pools = [pool(x, efu_pool, per_topic=efu_topics == 'topic') for x in efu]
+            efu = [x for configs, _ in pools for x in configs]
+            if efu_topics == 'partition':
+                event_partitions = pooled_partitions(event_partitions, efu_pool)
+            shards_file = efu_shards or f'{instr_name}_efu_shards.json'
+            save_efu_shards(shards_file, [shards for _, shards in pools])
+            print(f'EFU pool readout ports written to {shards_file}, use with mp-nexus-splitrun --efu-shards')
+
+        # Ensure stream topics exist, in one batch before any service needs them
+        topics = list(TOPICS.values())
+        profiles = topic_profiles(TOPICS, {'event': event_partitions})
+        for x in efu or []:
+            # Each EFU may write its events to a topic of its own
+            topics.append(x.topic)
+            profiles[x.topic] = profiles[TOPICS['event']]
+        register_topics(broker, topics, profiles, expand=event_partitions is not None)
 
         # Start up services if they should be managed locally
         if manage:
-            if efu is None:
-                data = {
-                    'name': instr_name,
-                    'binary': guess_instr_efu(instr_name),
-                    'config': guess_instr_config(name=instr_name),
-                    'calibration': guess_instr_calibration(name=instr_name),
-                    'topic': TOPICS['event'],
-                    'port': 9000
-                }
-                if any('port' in p.name for p in instr_parameters):
-                    from mccode_antlr.common.expression import DataType
-                    port_parameter = next(
-                        p for p in instr_parameters if 'port' in p.name)
-                    if port_parameter.value.has_value and port_parameter.value.data_type == DataType.int:
-                        # the instrument parameter has a default, which is an integer
-                        data['port'] = port_parameter.value.value
-                efu = [EventFormationUnitConfig.from_dict(data)]
-            things = tuple(
-                EventFormationUnit.start(
+            # The services are independent, so start them (and their blocking setup) concurrently
+            startup = ServiceStartup()
+            things = startup.start([
+                partial(
+                    EventFormationUnit.start,
                     style=Fore.BLUE,
                     broker=broker,
                     triage=Triage(ignore=["graphite", ":2003 failed"]),
+                    **output(x.name),
+                    restart=restart_policy(),
                     **x.to_dict()
-                ) for x in efu) + (
-                Forwarder.start(
+                ) for x in efu or []] + [
+                partial(
+                    Forwarder.start,
                     name='FWD',
                     style=Fore.GREEN,
                     broker=broker,
                     config=TOPICS['config'],
                     status=TOPICS['status'],
                     verbosity=forwarder_verbosity(verbosity_forwarder),
+                    update_period=forwarder_update_period,
+                    **output('FWD'),
+                    restart=restart_policy(),
                 ),
-                EPICSMailbox.start(
+                partial(
+                    EPICSMailbox.start,
                     name='MBX',
                     style=Fore.YELLOW + Back.LIGHTCYAN_EX,
                     parameters=instr_parameters,
                     prefix=PREFIX,
+                    **output('MBX'),
+                    restart=restart_policy(),
                 ),
-                KafkaToNexus.start(
+                partial(
+                    KafkaToNexus.start,
                     name='K2N',
                     style=Fore.RED + Style.DIM,
                     triage=Triage(ignore=["ignored by this consumer instance"]),
@@ -312,41 +506,77 @@ def load_in_wait_load_out(
                     command=TOPICS['command'],
                     pool=TOPICS['pool'],
                     verbosity=writer_verbosity(verbosity_writer),
+                    **output('K2N'),
+                    restart=restart_policy(),
                 ),
-            )
+            ])
             longest_name = max(len(thing.name) for thing in things)
             for thing in things:
                 thing.name_padding = longest_name - len(thing.name)
         else:
+            startup = None
             things = ()
 
-        # Ensure stream topics exist
-        register_topics(broker, list(TOPICS.values()))
+        sampler = ResourceSampler(things, sample_interval) if things and sample_interval else None
+
+        efus = [thing for thing in things if isinstance(thing, EventFormationUnit)]
+        # Poll often enough for steady rates, even if summaries are infrequent
+        collector = EFUStatsCollector(efus, min(1.0, efu_stats), efu_stats) if efus and efu_stats else None
+
+        def report_resources():
+            if sampler is not None:
+                sampler.stop()
+                print(sampler.summary())
+            if collector is not None:
+                collector.stop()
+                for x in collector.efus:
+                    print(collector.summary(x), end='')
+
+        def stop_services():
+            # Signal every service at once, so the slowest bounds the time taken
+            shutdown = ServiceShutdown(stop_timeout)
+            shutdown.stop(things)
+            if things:
+                print(shutdown.report())
 
         def signal_handler(signum, frame):
             if signum == signal.SIGINT:
                 print('Done waiting, following SIGINT')
-                for service in things:
-                    service.stop()
+                report_resources()
+                stop_services()
                 exit(0)
             else:
                 print(f'Received signal {signum}, ignoring')
 
         signal.signal(signal.SIGINT, signal_handler)
+        if startup is not None:
+            ready = startup.wait(ready_timeout)
+            startup.stop()
+            print(startup.report())
+            if not ready:
+                print(Fore.RED + Style.BRIGHT + f'Not all services were ready after {ready_timeout} s'
+                      + Style.RESET_ALL)
+        if sampler is not None:
+            sampler.start()
+        if collector is not None:
+            collector.start()
         print(
             Fore.YELLOW+Back.LIGHTGREEN_EX+Style.BRIGHT
             + "\tYou can now run 'mp-nexus-splitrun' in another process"
             + " (Press CTRL+C to exit)." + Style.RESET_ALL
         )
-        # signal.pause()
-        while all(service.poll() for service in things):
-            # Try to grab and print any updates
-            sleep(0.01)
+        # Sleep until any service exits, restarting those whose policy allows it;
+        # a SIGINT still interrupts the wait
+        supervise(things)
+        report_resources()
         # If we reach here, one or more service has _already_ stopped
         for service in things:
             if not service.poll():
                 print(f'{service.name} exited unexpectedly')
-            service.stop()
+            if service.restart.count:
+                print(f'{service.name} was restarted {service.restart.count} times, '
+                      f'down for {service.restart.downtime:.1f} s')
+        stop_services()
 
 
 def make_splitrun_nexus_parser():
@@ -359,26 +589,67 @@ def make_splitrun_nexus_parser():
     parser.add_argument('--structure', type=str, default=None, help='NeXus Structure JSON path')
     parser.add_argument('--structure-out', type=str, default=None, help='Output configured structure JSON path')
     parser.add_argument('--nexus-file', type=str, default=None, help='Output NeXus file path')
+    parser.add_argument('--forwarder-reset', action='store_true',
+                        help='Remove the parameter streams from the Forwarder after the simulation')
+    parser.add_argument('--forwarder-timeout', type=float, default=10.0,
+                        help='Seconds to wait for the Forwarder to report the parameter streams')
+    parser.add_argument('--forwarder-periodic', type=str, action='append', default=None, metavar='NAME',
+                        help='Parameter to forward periodically, not only on change, repeatable')
+    parser.add_argument('--efu-shards', type=str, default=None, metavar='FILE',
+                        help='EFU pool readout ports, as written by mp-nexus-services --efu-pool')
+    parser.add_argument('--efu-shard', type=int, default=0, metavar='INDEX',
+                        help='Which EFU of each pool this simulation sends its readouts to')
     return parser
 
 
+def shard_parameters(instr_parameters: tuple[InstrumentParameter, ...], parameters: dict, shards: dict,
+                     shard: int) -> dict:
+    """Set the readout port parameters of the instrument to send to one EFU of each pool
+
+    Parameters
+    ----------
+    instr_parameters: the instrument parameters, those with 'port' in their name are readout ports
+    parameters:       the parsed scan parameters, as from restage.splitrun.parse_splitrun
+    shards:           the EventFormationUnitShards of each pool, by detector name
+    shard:            the index of the EFU in each pool to use
+    """
+    from mccode_antlr.run.range import Singular
+    length = max((1 if isinstance(v, Singular) else len(v) for v in parameters.values()), default=1)
+    parameters = dict(parameters)
+    for name in [p.name for p in instr_parameters if 'port' in p.name]:
+        matches = [x for x in shards.values() if len(shards) == 1 or x.name in name]
+        if len(matches) != 1:
+            raise ValueError(f'Can not identify which EFU pool of {list(shards)} is for parameter {name}')
+        port = matches[0].port(shard)
+        print(f'Sending {name} readouts to {matches[0].host}:{port}, shard {shard} of {matches[0].name}')
+        parameters[name] = Singular(port, length)
+    return parameters
+
+
 def main():
     from mccode_plumber.mccode import get_mcstas_instr
     from restage.splitrun import parse_splitrun
     from mccode_plumber.splitrun import monitors_to_kafka_callback_with_arguments
     args, parameters, precision = parse_splitrun(make_splitrun_nexus_parser())
     instr = get_mcstas_instr(args.instrument)
+    if args.efu_shards:
+        from mccode_plumber.manage.efu import load_efu_shards
+        parameters = shard_parameters(instr.parameters, parameters, load_efu_shards(args.efu_shards), args.efu_shard)
+    delattr(args, 'efu_shards')
+    delattr(args, 'efu_shard')
 
     structure = load_file_json(args.structure if args.structure else Path(args.instrument).with_suffix('.json'))
 
-    streams = get_stream_pairs(structure)
+    streams = index_streams_by_topic(structure)
     # All monitors should use a single topic:
     monitor_topic = f'{instr.name}_beam_monitor'
-    monitor_names = [s[1] for s in streams if s[0] == monitor_topic]
+    monitor_names = [s.source for s in streams.get(monitor_topic, [])]
+    for s in streams.get(monitor_topic, []):
+        print(f'Monitor {s.source} sent to {s.path or "/"} via {monitor_topic}')
 
     broker = 'localhost:9092'
-    topics = list({s[0] for s in streams}) # ensure all topics are known to Kafka
-    register_topics(broker, topics)
+    topics = list(streams) # ensure all topics are known to Kafka
+    register_topics(broker, topics, topic_profiles({'event': TOPICS['event'], 'monitor': monitor_topic}))
 
     # Configure the callback to send monitor data to Kafka, using the common topic with source names as monitor names
     callback, callback_args = monitors_to_kafka_callback_with_arguments(
@@ -389,7 +660,10 @@ def main():
         'callback': callback, 'callback_arguments': callback_args,
     }
     kwargs = {
-        'nexus_file': args.nexus_file, 'structure_out': args.structure_out
+        'nexus_file': args.nexus_file, 'structure_out': args.structure_out,
+        'forwarder_reset': args.forwarder_reset,
+        'forwarder_timeout': args.forwarder_timeout,
+        'forwarder_periodic': args.forwarder_periodic,
     }
     for k in list(kwargs.keys()) + ['structure']:
         delattr(args, k)
@@ -403,11 +677,14 @@ def orchestrate(
         splitrun_kwargs: dict,
         nexus_file: str | None= None,
         structure_out: str | None = None,
+        forwarder_reset: bool = False,
+        forwarder_timeout: float = 10.0,
+        forwarder_periodic: list[str] | None = None,
 ):
     from datetime import datetime, timezone
     from restage.splitrun import splitrun_args
     from mccode_plumber.forwarder import (
-        forwarder_partial_streams, configure_forwarder, reset_forwarder
+        forwarder_partial_streams, synchronise_forwarder, reset_forwarder, verify_forwarder, UpdatePolicy
     )
     now = datetime.now(timezone.utc)
     title = f'{instr.name} simulation {now}: {splitrun_kwargs["args"]}'
@@ -417,10 +694,16 @@ def orchestrate(
     # provide the file stem.
     filename = ensure_writable_file(nexus_file or f'{instr.name}_{now:%y%m%dT%H%M%S}.h5')
 
-    # Tell the forwarder what to forward
-    partial_streams = forwarder_partial_streams(PREFIX, TOPICS['parameter'], instr.parameters)
+    # Tell the forwarder what to forward, sending only changes from the previous run
+    policies = {name: UpdatePolicy.PERIODIC for name in forwarder_periodic or []}
+    partial_streams = forwarder_partial_streams(PREFIX, TOPICS['parameter'], instr.parameters, policies)
     forwarder_config = f"{broker}/{TOPICS['config']}"
-    configure_forwarder(partial_streams, forwarder_config, PREFIX, TOPICS['parameter'])
+    synchronise_forwarder(partial_streams, forwarder_config, PREFIX, TOPICS['parameter'])
+    # and wait until it reports forwarding them, so that no early updates are lost
+    forwarder_status = f"{broker}/{TOPICS['status']}"
+    if not verify_forwarder(partial_streams, forwarder_config, forwarder_status, PREFIX, TOPICS['parameter'],
+                            timeout=forwarder_timeout):
+        print(f'The forwarder did not report forwarding all parameters within {forwarder_timeout} s')
 
     # Create a file-writer job
     structure = augment_structure(instr.parameters, structure, title)
@@ -438,8 +721,9 @@ def orchestrate(
         print("Splitrun simulation finished -- informing file-writer to stop")
     # Wait for the file-writer to finish its job (possibly kill it)
     stop_writer(broker, job_id, 20.0)
-    # De-register the forwarder topics
-    reset_forwarder(partial_streams, forwarder_config, PREFIX, TOPICS['parameter'])
+    # Leave the forwarder streams in place for the next run, unless asked to remove them
+    if forwarder_reset:
+        reset_forwarder(partial_streams, forwarder_config, PREFIX, TOPICS['parameter'], delta=True)
     # Verify that the file has been written?
     # This only works if the filewriter was stared in the same directory :(
     # ensure_readable_file(filename)
@@ -0,0 +1,198 @@
+"""Read the output of all managed processes, and write it through one sink
+
+The standard output and error pipes of every managed process are read in large
+chunks by a single thread, which waits on all of them with a selector and splits
+their output into lines itself. Each line is passed to the handler registered
+with its pipe, e.g., to be triaged and prefixed with the process name, and all
+resulting text for each standard stream is written at once.
+
+An exception raised while handling a pipe's lines stops the reading of only that
+pipe, and one raised while writing to the sink drops only that batch, so that the
+pipes of every other process continue to be drained.
+
+Windows pipes can not be used with selectors, so there a thread reads each pipe.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from threading import Lock, Thread
+from typing import Callable
+
+from .manager import IOType
+
+# The maximum number of bytes read from a pipe at once
+CHUNK_SIZE = 65536
+
+LineHandler = Callable[[str], 'str | None']
+
+
+def _report(message: str):
+    """Write a problem with reading output to standard error, if that is possible"""
+    try:
+        sys.stderr.write(message + '\n')
+        sys.stderr.flush()
+    except Exception:
+        pass
+
+
+class OutputSink:
+    """Write text to this process's standard output or error, one write per batch of lines"""
+    def __init__(self):
+        self.lock = Lock()
+
+    def write(self, io_type: IOType, texts: list[str]):
+        if not texts:
+            return
+        # Look up the streams on every write, in case they have been redirected
+        stream = sys.stdout if io_type == IOType.stdout else sys.stderr
+        with self.lock:
+            stream.write(''.join(texts))
+            stream.flush()
+
+
+def _write(sink: OutputSink, io_type: IOType, texts: list[str], failed: set[IOType]):
+    """Write texts to the sink, reporting the first of any consecutive failures for a stream"""
+    try:
+        sink.write(io_type, texts)
+    except Exception as e:
+        if io_type not in failed:
+            failed.add(io_type)
+            _report(f'Dropping managed process output which could not be written to {io_type.name}: {e!r}')
+    else:
+        failed.discard(io_type)
+
+
+class _Source:
+    """One pipe, its handler, and any incomplete line read from it"""
+    def __init__(self, stream, io_type: IOType, handler: LineHandler, name: str | None = None):
+        self.stream = stream
+        self.io_type = io_type
+        self.handler = handler
+        self.name = name
+        self.partial = b''
+
+    def safe_feed(self, data: bytes) -> list[str] | None:
+        """Handle data as feed does, or report the exception raised and return None"""
+        try:
+            return self.feed(data)
+        except Exception as e:
+            _report(f'Stopped reading the {self.io_type.name} of {self.name or "a managed process"}: {e!r}')
+            return None
+
+    def feed(self, data: bytes) -> list[str]:
+        """Handle the complete lines of data, or the final incomplete line if data is empty"""
+        if data:
+            *lines, self.partial = (self.partial + data).split(b'\n')
+        else:
+            lines, self.partial = ([self.partial] if self.partial else []), b''
+        texts = []
+        for line in lines:
+            text = self.handler(line.decode(errors='replace').removesuffix('\r') + '\n')
+            if text is not None:
+                texts.append(text)
+        return texts
+
+    def close(self):
+        try:
+            self.stream.close()
+        except Exception:
+            pass
+
+
+class OutputReader:
+    """Read many pipes from one thread, started when the first pipe is added"""
+    def __init__(self, sink: OutputSink | None = None):
+        import selectors
+        self.sink = sink or OutputSink()
+        self.selector = selectors.DefaultSelector()
+        self.lock = Lock()
+        self.pending: list[_Source] = []
+        self.thread: Thread | None = None
+        # Adding a pipe wakes the reader thread, which then registers it with the selector
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self._sink_failed: set[IOType] = set()
+
+    def add(self, stream, io_type: IOType, handler: LineHandler, name: str | None = None):
+        """Read lines from a binary pipe until it closes, passing each to handler
+
+        Text returned by the handler is written to the sink, lines for which it
+        returns None are dropped. The pipe is closed after it reaches EOF, or after
+        the handler raises an exception, which is reported with the pipe's name.
+        """
+        with self.lock:
+            self.pending.append(_Source(stream, io_type, handler, name))
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name='managed-output', daemon=True)
+                self.thread.start()
+        os.write(self._wake_write, b'\0')
+
+    def _register_pending(self):
+        import selectors
+        try:
+            while os.read(self._wake_read, CHUNK_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for source in pending:
+            self.selector.register(source.stream.fileno(), selectors.EVENT_READ, source)
+
+    def _run(self):
+        while True:
+            texts: dict[IOType, list[str]] = {IOType.stdout: [], IOType.stderr: []}
+            for key, _ in self.selector.select():
+                source = key.data
+                if source is None:
+                    self._register_pending()
+                    continue
+                try:
+                    data = os.read(key.fd, CHUNK_SIZE)
+                except OSError:
+                    data = b''
+                if (handled := source.safe_feed(data)) is not None:
+                    texts[source.io_type].extend(handled)
+                if not data or handled is None:
+                    self.selector.unregister(key.fd)
+                    source.close()
+            for io_type, io_texts in texts.items():
+                _write(self.sink, io_type, io_texts, self._sink_failed)
+
+
+class ThreadedOutputReader:
+    """Read each pipe from its own thread, for platforms where pipes can not be selected"""
+    def __init__(self, sink: OutputSink | None = None):
+        self.sink = sink or OutputSink()
+        self._sink_failed: set[IOType] = set()
+
+    def add(self, stream, io_type: IOType, handler: LineHandler, name: str | None = None):
+        Thread(target=self._run, args=(_Source(stream, io_type, handler, name),), daemon=True).start()
+
+    def _run(self, source: _Source):
+        while True:
+            try:
+                data = os.read(source.stream.fileno(), CHUNK_SIZE)
+            except (OSError, ValueError):
+                data = b''
+            if (handled := source.safe_feed(data)) is None:
+                break
+            _write(self.sink, source.io_type, handled, self._sink_failed)
+            if not data:
+                break
+        source.close()
+
+
+_SHARED_READER: OutputReader | ThreadedOutputReader | None = None
+_SHARED_READER_LOCK = Lock()
+
+
+def shared_output_reader() -> OutputReader | ThreadedOutputReader:
+    """The reader used for the output of all managed processes, created by the first caller"""
+    global _SHARED_READER
+    with _SHARED_READER_LOCK:
+        if _SHARED_READER is None:
+            _SHARED_READER = ThreadedOutputReader() if os.name == 'nt' else OutputReader()
+        return _SHARED_READER
@@ -0,0 +1,204 @@
+"""Start managed services concurrently, and wait until each is ready for use
+
+Each Manager provides a readiness probe, a callable which returns whether its
+service can be used yet; e.g., whether the EFU command port accepts connections,
+the mailbox PVs can be read, or the forwarder or file-writer has published a
+status message. Probes are called repeatedly, from a thread per service, until
+they succeed or the service exits.
+"""
+from __future__ import annotations
+
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Callable
+
+from .manager import Manager
+
+
+class PortProbe:
+    """Ready once a TCP port accepts connections"""
+    def __init__(self, port: int, host: str = 'localhost', timeout: float = 0.5):
+        self.address = host, port
+        self.timeout = timeout
+
+    def __call__(self) -> bool:
+        import socket
+        try:
+            with socket.create_connection(self.address, timeout=self.timeout):
+                return True
+        except OSError:
+            return False
+
+
+class PVProbe:
+    """Ready once an EPICS PV can be read"""
+    def __init__(self, address: str, timeout: float = 0.5):
+        self.address = address
+        self.timeout = timeout
+        self._ctx = None
+
+    def __call__(self) -> bool:
+        from p4p.client.thread import Context
+        if self._ctx is None:
+            self._ctx = ctx = Context('pva')
+        else:
+            ctx = self._ctx
+        if isinstance(ctx.get(self.address, timeout=self.timeout, throw=False), Exception):
+            # The client backs off searching for a PV it has not found, so start afresh next time
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self._ctx is not None:
+            self._ctx.close()
+            self._ctx = None
+
+
+class StatusMessageProbe:
+    """Ready once a new status message is published to a Kafka topic
+
+    Only messages published after the probe is first called count, so a status left in
+    the topic by an earlier instance of the service is not mistaken for this one.
+    """
+    def __init__(self, broker: str, topic: str, timeout: float = 0.5):
+        self.broker = broker
+        self.topic = topic
+        self.timeout = timeout
+        self.seen = False
+        self._consumer = None
+
+    def _assign(self):
+        from uuid import uuid4
+        from confluent_kafka import Consumer, TopicPartition
+        consumer = Consumer({
+            'bootstrap.servers': self.broker,
+            'group.id': f'mccode-plumber-{uuid4()}',
+            'enable.auto.commit': False,
+        })
+        metadata = consumer.list_topics(self.topic, timeout=10.0)
+        assignment = []
+        for partition in metadata.topics[self.topic].partitions:
+            tp = TopicPartition(self.topic, partition)
+            tp.offset = consumer.get_watermark_offsets(tp, timeout=10.0)[1]
+            assignment.append(tp)
+        consumer.assign(assignment)
+        return consumer
+
+    def __call__(self) -> bool:
+        from streaming_data_types.status_x5f2 import deserialise_x5f2
+        from streaming_data_types.exceptions import StreamingDataTypesException
+        if self.seen:
+            return True
+        if self._consumer is None:
+            self._consumer = consumer = self._assign()
+        else:
+            consumer = self._consumer
+        message = consumer.poll(self.timeout)
+        if message is None or message.error():
+            return False
+        try:
+            deserialise_x5f2(message.value())
+        except StreamingDataTypesException:
+            return False
+        self.seen = True
+        return True
+
+    def close(self):
+        if self._consumer is not None:
+            self._consumer.close()
+            self._consumer = None
+
+
+class ServiceStartup:
+    """Start services concurrently, then probe each until all are ready
+
+    Properties
+    ----------
+    managers:    the started services, in the order of their starters
+    start_times: seconds from the startup until each service process was launched, by index in managers
+    ready_times: seconds from the startup until each service was ready, by index in managers
+    all_ready:   set once every service is ready
+    """
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.started = monotonic()
+        self.managers: tuple[Manager, ...] = ()
+        self.start_times: dict[int, float] = {}
+        self.ready_times: dict[int, float] = {}
+        self.all_ready = Event()
+        self._stopped = Event()
+        # Set once every probe has finished, whether its service became ready or exited
+        self._finished = Event()
+        self._probing = 0
+        self._lock = Lock()
+
+    def start(self, starters: list[Callable[[], Manager]]) -> tuple[Manager, ...]:
+        """Call every starter concurrently, e.g., Manager.start with its configuration, then probe them
+
+        If any starter raises an exception, the services which did start are stopped
+        and the first exception is raised.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        self.started = monotonic()
+
+        def timed(index, starter):
+            manager = starter()
+            self.start_times[index] = monotonic() - self.started
+            return manager
+
+        with ThreadPoolExecutor(max_workers=max(1, len(starters))) as executor:
+            futures = [executor.submit(timed, index, starter) for index, starter in enumerate(starters)]
+        errors = [error for f in futures if (error := f.exception()) is not None]
+        if errors:
+            from .supervise import ServiceShutdown
+            ServiceShutdown().stop([f.result() for f in futures if f.exception() is None])
+            raise errors[0]
+        self.managers = tuple(f.result() for f in futures)
+        self._probing = len(self.managers)
+        if not self.managers:
+            self.all_ready.set()
+            self._finished.set()
+        for index, manager in enumerate(self.managers):
+            Thread(target=self._probe, args=(index, manager), daemon=True).start()
+        return self.managers
+
+    def _probe(self, index: int, manager: Manager):
+        probe = manager.readiness_probe()
+        try:
+            while not self._stopped.is_set() and manager.poll():
+                if probe():
+                    with self._lock:
+                        self.ready_times[index] = monotonic() - self.started
+                        if len(self.ready_times) == len(self.managers):
+                            self.all_ready.set()
+                    return
+                self._stopped.wait(self.interval)
+        finally:
+            if hasattr(probe, 'close'):
+                probe.close()
+            with self._lock:
+                self._probing -= 1
+                if not self._probing:
+                    self._finished.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until every service is ready or has exited, or timeout seconds pass; return whether all are ready"""
+        self._finished.wait(timeout)
+        return self.all_ready.is_set()
+
+    def stop(self):
+        """Stop probing services which are not yet ready"""
+        self._stopped.set()
+
+    def report(self) -> str:
+        """The time taken for each service to start and become ready"""
+        width = max((len(m.name) for m in self.managers), default=0)
+        lines = []
+        for index, manager in enumerate(self.managers):
+            started = self.start_times[index]
+            ready = self.ready_times.get(index)
+            ready_str = f'ready after {ready:.2f} s' if ready is not None else \
+                'not ready' if manager.poll() else 'exited before it was ready'
+            lines.append(f'{manager.name:>{width}}: started after {started:.2f} s, {ready_str}')
+        return '\n'.join(lines)
@@ -0,0 +1,158 @@
+"""Sample the resource use of managed processes, to find which service is a bottleneck
+
+One thread reads `/proc/<pid>/stat` and `/proc/<pid>/status` for every managed
+process at a fixed interval, and keeps a time series for each service of its CPU
+use, resident memory, thread count, and the rate at which it writes output.
+Without a /proc filesystem, e.g., on macOS or Windows, no samples are recorded.
+"""
+from __future__ import annotations
+
+import os
+from collections import deque
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from .manager import Manager
+
+
+@dataclass
+class ResourceSample:
+    """
+    The resource use of one process over one sampling interval
+
+    Properties
+    ----------
+    time:    seconds since the sampler started
+    pid:     the process sampled, which changes when a service is restarted
+    cpu:     CPU seconds used per second since the previous sample, 1.0 is one full core
+    rss:     resident memory, in bytes
+    threads: the number of threads
+    output:  characters written per second to standard output and error since the previous sample
+    """
+    time: float
+    pid: int
+    cpu: float
+    rss: int
+    threads: int
+    output: float
+
+
+def read_proc(pid: int) -> tuple[float, int, int] | None:
+    """The CPU seconds used, resident bytes and thread count of a process, or None if it can not be read"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+        with open(f'/proc/{pid}/status', 'rb') as f:
+            status = f.read()
+    except OSError:
+        return None
+    # The command name is enclosed in parentheses, and may itself contain spaces or parentheses;
+    # utime and stime are the 14th and 15th fields, counting the pid as the first
+    fields = stat[stat.rindex(b')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    rss, threads = 0, 0
+    for line in status.splitlines():
+        if line.startswith(b'VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+        elif line.startswith(b'Threads:'):
+            threads = int(line.split()[1])
+    return cpu, rss, threads
+
+
+class ResourceSampler:
+    """Record the resource use of managed processes from a single thread
+
+    Parameters
+    ----------
+    managers: the managers whose processes are sampled, more can be added later
+    interval: seconds between samples
+    history:  the most samples kept for each service, or None to keep all
+    """
+    def __init__(self, managers=(), interval: float = 1.0, history: int | None = 3600):
+        self.interval = interval
+        self.history = history
+        self.started = monotonic()
+        self.managers: list[Manager] = []
+        self.samples: dict[str, deque[ResourceSample]] = {}
+        # The time, pid, CPU seconds and output characters at the previous sample of each service
+        self._previous: dict[str, tuple[float, int, float, int]] = {}
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+        for manager in managers:
+            self.add(manager)
+
+    def add(self, manager: Manager):
+        with self._lock:
+            self.managers.append(manager)
+            self.samples.setdefault(manager.name, deque(maxlen=self.history))
+
+    def sample(self):
+        """Record one sample of every running managed process"""
+        now = monotonic()
+        with self._lock:
+            managers = list(self.managers)
+        for manager in managers:
+            process = manager._process
+            if process is None or process.poll() is not None:
+                continue
+            if (usage := read_proc(process.pid)) is None:
+                continue
+            cpu, rss, threads = usage
+            output = sum(manager._output_chars.values())
+            previous = self._previous.get(manager.name)
+            self._previous[manager.name] = now, process.pid, cpu, output
+            if previous is None or previous[1] != process.pid:
+                # Rates need two samples of the same process
+                continue
+            elapsed = now - previous[0]
+            if elapsed <= 0:
+                continue
+            sample = ResourceSample(time=now - self.started, pid=process.pid, cpu=(cpu - previous[2]) / elapsed,
+                                    rss=rss, threads=threads, output=(output - previous[3]) / elapsed)
+            with self._lock:
+                self.samples[manager.name].append(sample)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """Sample every interval, from a background thread, until stopped"""
+        if self._thread is None:
+            self.started = monotonic()
+            self.sample()
+            self._thread = Thread(target=self._run, name='resource-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def series(self, name: str) -> list[ResourceSample]:
+        """All kept samples of the named service, oldest first"""
+        with self._lock:
+            return list(self.samples.get(name, ()))
+
+    def latest(self) -> dict[str, ResourceSample]:
+        """The most recent sample of each service which has been sampled"""
+        with self._lock:
+            return {name: samples[-1] for name, samples in self.samples.items() if samples}
+
+    def summary(self) -> str:
+        """The mean and peak resource use of each service"""
+        with self._lock:
+            series = {name: list(samples) for name, samples in self.samples.items()}
+        width = max((len(name) for name in series), default=0)
+        lines = [f'{"":>{width}}  {"CPU mean":>8} {"CPU max":>8} {"RSS max":>10} {"threads":>7} {"output":>10}']
+        for name, samples in series.items():
+            if not samples:
+                lines.append(f'{name:>{width}}  not sampled')
+                continue
+            cpu = [s.cpu for s in samples]
+            lines.append(f'{name:>{width}}  {sum(cpu) / len(cpu):>8.0%} {max(cpu):>8.0%} '
+                         f'{max(s.rss for s in samples) / 2 ** 20:>6.1f} MiB {max(s.threads for s in samples):>7} '
+                         f'{max(s.output for s in samples):>8.0f}/s')
+        return '\n'.join(lines)
@@ -0,0 +1,193 @@
+"""Wait for managed processes to exit, without polling, and restart them
+
+On Linux a pidfd for each process is waited on with a selector, so the waiting
+thread sleeps until a process exits. Elsewhere, or if a pidfd can not be opened,
+a thread per process waits for it and then wakes the selector through a socket.
+
+A process which exits is restarted, after a backoff delay, if its manager's
+RestartPolicy allows it. All processes are stopped together, each within a
+deadline after which it is killed.
+"""
+from __future__ import annotations
+
+import os
+import selectors
+import socket
+from queue import SimpleQueue, Empty
+from threading import Thread
+
+from .manager import Manager
+
+
+class ProcessWatcher:
+    """Report when any of the watched managed processes exits
+
+    Parameters
+    ----------
+    managers: the started managers to watch, more can be added later
+    """
+    def __init__(self, managers=()):
+        self.selector = selectors.DefaultSelector()
+        # Exits noticed by waiter threads, which then wake the selector
+        self.exited: SimpleQueue[Manager] = SimpleQueue()
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+        for manager in managers:
+            self.add(manager)
+
+    def add(self, manager: Manager):
+        process = manager._process
+        if process is None or process.poll() is not None:
+            self._notify(manager)
+            return
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except OSError:
+                pass  # e.g., a kernel older than Linux 5.3
+            else:
+                self.selector.register(pidfd, selectors.EVENT_READ, manager)
+                return
+        Thread(target=self._wait_for, args=(manager,), daemon=True).start()
+
+    def _notify(self, manager: Manager):
+        self.exited.put(manager)
+        self._wake_write.send(b'\0')
+
+    def _wait_for(self, manager: Manager):
+        if manager._process is not None:
+            manager._process.wait()
+        self._notify(manager)
+
+    def wait(self, timeout: float | None = None) -> list[Manager]:
+        """Sleep until at least one watched process exits, or timeout seconds pass
+
+        Returns
+        -------
+        The managers whose processes have exited, which are no longer watched
+        """
+        exited = []
+        for key, _ in self.selector.select(timeout):
+            if key.data is None:
+                try:
+                    while self._wake_read.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            self.selector.unregister(key.fd)
+            os.close(key.fd)
+            # Collect the exit status, so the process is not left a zombie
+            key.data.poll()
+            exited.append(key.data)
+        while True:
+            try:
+                exited.append(self.exited.get_nowait())
+            except Empty:
+                break
+        return exited
+
+    def close(self):
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                os.close(key.fd)
+        self.selector.close()
+        self._wake_read.close()
+        self._wake_write.close()
+
+
+def supervise(managers, watcher: ProcessWatcher | None = None) -> list[Manager]:
+    """Restart managed processes as their policies allow, until one exits which is not restarted
+
+    Parameters
+    ----------
+    managers: the started managers to supervise
+    watcher:  a ProcessWatcher already watching the managers, otherwise one is made and closed
+
+    Returns
+    -------
+    The managers whose processes exited and were not restarted
+    """
+    from heapq import heappush, heappop
+    from itertools import count
+    from time import monotonic
+    own_watcher = watcher is None
+    if watcher is None:
+        watcher = ProcessWatcher(managers)
+    # (restart time, exit time, tie-breaker, manager) for each process waiting to be restarted
+    pending: list[tuple[float, float, int, Manager]] = []
+    order = count()
+    try:
+        while True:
+            timeout = max(0.0, pending[0][0] - monotonic()) if pending else None
+            finished = []
+            for manager in watcher.wait(timeout):
+                returncode = manager._process.returncode if manager._process is not None else None
+                if not manager.restart.wanted(returncode):
+                    finished.append(manager)
+                    continue
+                delay = manager.restart.delay()
+                print(f'{manager.name} exited with status {returncode}, restarting in {delay:.1f} s')
+                now = monotonic()
+                heappush(pending, (now + delay, now, next(order), manager))
+            if finished:
+                return finished
+            while pending and pending[0][0] <= monotonic():
+                _, exited, _, manager = heappop(pending)
+                try:
+                    manager.relaunch(monotonic() - exited)
+                except OSError as error:
+                    print(f'{manager.name} could not be restarted: {error}')
+                    return [manager]
+                watcher.add(manager)
+    finally:
+        if own_watcher:
+            watcher.close()
+
+
+class ServiceShutdown:
+    """Stop services concurrently, killing any which do not exit before a deadline
+
+    Properties
+    ----------
+    timeout:  seconds each service has to finalize and exit, before it is killed
+    managers: the stopped services
+    elapsed:  seconds taken to stop each service, by index in managers
+    killed:   the indexes in managers of services which were killed
+    """
+    def __init__(self, timeout: float | None = 10.0):
+        self.timeout = timeout
+        self.managers: tuple[Manager, ...] = ()
+        self.elapsed: dict[int, float] = {}
+        self.killed: set[int] = set()
+
+    def stop(self, managers) -> bool:
+        """Stop every manager at once, returning whether all exited without being killed"""
+        from concurrent.futures import ThreadPoolExecutor
+        from time import monotonic
+        self.managers = tuple(managers)
+        started = monotonic()
+
+        def timed(index, manager):
+            try:
+                if not manager.stop(self.timeout):
+                    self.killed.add(index)
+            finally:
+                self.elapsed[index] = monotonic() - started
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.managers))) as executor:
+            futures = [executor.submit(timed, index, manager) for index, manager in enumerate(self.managers)]
+        for future in futures:
+            if (error := future.exception()) is not None:
+                print(f'Error while stopping: {error}')
+        return not self.killed
+
+    def report(self) -> str:
+        """The time taken to stop each service"""
+        width = max((len(m.name) for m in self.managers), default=0)
+        return '\n'.join(
+            f'{manager.name:>{width}}: stopped after {self.elapsed.get(index, float("nan")):.2f} s'
+            + (', killed' if index in self.killed else '')
+            for index, manager in enumerate(self.managers)
+        )
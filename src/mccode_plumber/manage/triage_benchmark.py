@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark utility for the Triage classification of process output.
+
+Run as module:
+    python -m mccode_plumber.manage.triage_benchmark [LOG_FILE ...] [-n 100000]
+
+Each line of the captured log files, or of a synthetic mix of service output if
+none are given, is triaged by the compiled Triage and by the reference
+implementation which searches each pattern in turn. Lines per second are shown
+for both, and any line on which they disagree is reported.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from time import perf_counter
+
+from mccode_plumber.manage.manager import Triage
+
+SAMPLE_LINES = [
+    '2026-10-19 01:02:03.456 [info] Starting writer module f144 for source mcstas:a1\n',
+    '2026-10-19 01:02:03.457 [trace] Message received on topic mcstasMonitor offset 123456\n',
+    '2026-10-19 01:02:03.458 [debug] Flushing 1024 events to /entry/instrument/detector\n',
+    'WARNING: Kafka consumer lag is increasing\n',
+    'ERR Received an invalid flatbuffer with schema id ev44\n',
+    'Traceback (most recent call last):\n',
+    '%6|1760000000.000|FAIL|rdkafka#producer-1| localhost:9092/bootstrap: Connect to ipv4#127.0.0.1:9092 failed\n',
+    'graphite: unable to connect to localhost:2003 failed\n',
+    'Sample 1000000 of 1000000 done\n',
+    'Stats: rx_packets 12345 rx_bytes 678910 events 9999\n',
+]
+
+
+def reference_triage(triage: Triage, line: str) -> tuple[bool, str | None]:
+    """Triage a line by searching for each pattern of each level in turn"""
+    import re
+    if any(kw in line for kw in triage.ignore):
+        return True, None
+    ranks = {level: i for i, level in enumerate(triage.patterns)}
+    for level, patterns in triage.patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, line, re.IGNORECASE):
+                return ranks[level] > ranks.get(triage.level, -1), triage._style_line(level, line)
+    return -1 > ranks.get(triage.level, -1), triage._style_line('default', line)
+
+
+def load_lines(filenames: list[Path], count: int) -> list[str]:
+    lines = []
+    for filename in filenames:
+        with filename.open('r', errors='replace') as file:
+            lines.extend(file.readlines())
+    if not lines:
+        lines = SAMPLE_LINES
+    return [lines[i % len(lines)] for i in range(count)]
+
+
+def benchmark_triage(lines: list[str], triage: Triage) -> tuple[float, float, int]:
+    """Return the lines per second of the reference and compiled triage, and the number of disagreements"""
+    start = perf_counter()
+    expected = [reference_triage(triage, line) for line in lines]
+    reference = perf_counter() - start
+    start = perf_counter()
+    results = [triage(line) for line in lines]
+    compiled = perf_counter() - start
+    differences = sum(a != b for a, b in zip(expected, results))
+    return len(lines) / reference, len(lines) / compiled, differences
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Benchmark the Triage of process output lines')
+    parser.add_argument('logs', type=Path, nargs='*', help='Captured log files, default a synthetic sample')
+    parser.add_argument('-n', '--count', type=int, default=100_000, help='Number of lines to triage')
+    parser.add_argument('-i', '--ignore', type=str, nargs='*', default=['graphite', ':2003 failed'],
+                        help='Keywords of lines to ignore')
+    args = parser.parse_args()
+
+    lines = load_lines(args.logs, args.count)
+    reference, compiled, differences = benchmark_triage(lines, Triage(ignore=args.ignore))
+    print(f"{'lines':>8} {'reference lines/s':>18} {'compiled lines/s':>17} {'speedup':>8} {'differences':>12}")
+    print(f'{len(lines):>8} {reference:>18.0f} {compiled:>17.0f} {compiled / reference:>8.1f} {differences:>12}')
+
+
+if __name__ == "__main__":
+    main()
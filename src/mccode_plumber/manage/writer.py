@@ -51,6 +51,11 @@ class KafkaToNexus(Manager):
             args.extend(['--verbosity', v])
         return args
 
+    def readiness_probe(self):
+        """Ready once the file-writer publishes a status message"""
+        from .readiness import StatusMessageProbe
+        return StatusMessageProbe(self.broker, self.command)
+
 
 def writer_verbosity(v):
     if isinstance(v, str):
@@ -2,7 +2,8 @@
 
 """
 A fake EFU server for testing purposes. Arguments needed for a real EFU are accepted,
-but only the command port is utilized.
+but only the command port is utilized. It answers the statistics commands
+STAT_GET_COUNT and STAT_GET, with made-up counters on one line each, and echoes anything else.
 
 Usage:
 ------
@@ -42,26 +43,65 @@ def main():
     serve(args.cmdport)
 
 
+def statistics(elapsed):
+    """Counters which increase steadily with the time since the server started, like a busy EFU's"""
+    return [
+        ('fake.receive.packets', int(1000 * elapsed)),
+        ('fake.receive.dropped', int(100 * elapsed)),
+        ('fake.readouts.count', int(20000 * elapsed)),
+        ('fake.events.count', int(18000 * elapsed)),
+    ]
+
+
+def respond(received, started):
+    """The reply to a statistics command, or None if received is not one"""
+    import time
+    stats = statistics(time.monotonic() - started)
+    command = received.split()
+    if command == ['STAT_GET_COUNT']:
+        return f'STAT_GET_COUNT {len(stats)}'
+    if len(command) == 2 and command[0] == 'STAT_GET' and command[1].isdigit():
+        # statistics are numbered from 1
+        index = int(command[1])
+        if 0 < index <= len(stats):
+            name, value = stats[index - 1]
+            return f'STAT_GET {name} {value}'
+        return 'Error: <BADOPT>'
+    return None
+
+
+def handle(c, a, started):
+    import os
+    with c:
+        while received := str(c.recv(1024), 'utf-8'):
+            if (reply := respond(received, started)) is not None:
+                c.sendall(bytes(reply + '\n', 'utf-8'))
+                continue
+            print(f'{a} says: {received}')
+            if received == 'EXIT\n':
+                c.sendall(bytes('<OK>', 'utf-8'))
+                os._exit(0)
+            else:
+                c.sendall(bytes(received, 'utf-8'))
+
+
 def serve(p):
     import socket
-    l = []
+    import time
+    from threading import Thread
+    started = time.monotonic()
+    count = 0
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # Since we're undoubtedly calling this after an ephemeral_port_reserve.reserve() call
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     s.bind(('', p))
-    s.listen(1)
+    s.listen(5)
     while 1:
         (c, a) = s.accept()
-        l.append(c)
-        print(f'{len(l)}: connection from {a}')
-        received = str(c.recv(1024), 'utf-8')
-        print(f'{a} says: {received}')
-        if received == 'EXIT\n':
-            c.sendall(bytes('<OK>', 'utf-8'))
-            exit(0)
-        else:
-            c.sendall(bytes(received, 'utf-8'))
-        c.close()
+        count += 1
+        print(f'{count}: connection from {a}')
+        # Like the real EFU, serve each connection until its client closes it, alongside others
+        Thread(target=handle, args=(c, a, started), daemon=True).start()
 
 
 if __name__ == '__main__':
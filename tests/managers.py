@@ -0,0 +1,47 @@
+"""Managed processes, and a fake EFU, shared by the tests of process management"""
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from mccode_plumber.manage.manager import Manager
+
+FAKE_EFU = Path(__file__).resolve().parent / 'fake_efu.py'
+
+# Writes a line at each Triage level, and one to stderr, then exits
+PRINTER = ("import sys; print('hello'); print('debug noise'); print('ignore me'); "
+           "sys.stderr.write('an error\\n')")
+
+
+@dataclass
+class Script(Manager):
+    script: str
+
+    def __run_command__(self) -> list[str]:
+        return [sys.executable, '-c', self.script]
+
+
+@dataclass
+class Sleeper(Manager):
+    seconds: float
+
+    def __run_command__(self) -> list[str]:
+        return [sys.executable, '-c', f'import time; time.sleep({self.seconds})']
+
+
+def fake_efu_arguments() -> dict:
+    """The EventFormationUnit.start arguments to run fake_efu.py on a free command port"""
+    from ephemeral_port_reserve import reserve
+    return dict(binary=FAKE_EFU, config=FAKE_EFU, calibration=FAKE_EFU, command=reserve())
+
+
+def start_fake_efu(name: str = 'efu', timeout: float = 10.0):
+    """Start fake_efu.py, and wait until its command port accepts connections"""
+    from mccode_plumber.manage import EventFormationUnit
+    from mccode_plumber.manage.readiness import PortProbe
+    service = EventFormationUnit.start(name=name, **fake_efu_arguments())
+    probe = PortProbe(service.command)
+    end = time.monotonic() + timeout
+    while not probe() and time.monotonic() < end:
+        time.sleep(0.05)
+    return service
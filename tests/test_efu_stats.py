@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+
+from mccode_plumber.manage.efu_stats import EFUCommandClient, EFUStatsCollector, category
+
+from .managers import start_fake_efu
+
+
+def test_category():
+    assert category('loki.receive.packets') == 'packets'
+    assert category('loki.receive.dropped') == 'drops'
+    assert category('loki.readouts.error_bytes') == 'drops'
+    assert category('loki.events.count') == 'events'
+    assert category('main.uptime') is None
+
+
+def serve_replies(replies):
+    """Answer each line received on one connection with the next of replies, sent a byte at a time"""
+    import socket
+    from threading import Thread
+    server = socket.create_server(('localhost', 0))
+
+    def run():
+        with server, server.accept()[0] as connection, connection.makefile('rb') as reader:
+            for reply in replies:
+                if not reader.readline():
+                    break
+                for byte in reply:
+                    connection.sendall(bytes([byte]))
+                    time.sleep(0.001)
+
+    Thread(target=run, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def test_split_replies():
+    replies = [b'STAT_GET_COUNT 2\n', b'STAT_GET a.packets 5\n', b'STAT_GET a.events 7\n']
+    client = EFUCommandClient(serve_replies(replies))
+    assert client.statistics() == {'a.packets': 5, 'a.events': 7}
+    client.close()
+
+
+def test_unexpected_reply():
+    client = EFUCommandClient(serve_replies([b'STAT_GET_COUNT 1\n', b'Error: <BADOPT>\n']))
+    with pytest.raises(ValueError, match='BADOPT'):
+        client.statistics()
+    # The connection is closed, rather than left with its replies out of step
+    assert client._sock is None
+
+@pytest.fixture
+def efu():
+    service = start_fake_efu('efu')
+    yield service
+    service.stop(timeout=5)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='fake_efu.py is run directly as an executable')
+def test_statistics(efu):
+    client = EFUCommandClient(efu.command)
+    first = client.statistics()
+    assert sorted(first) == ['fake.events.count', 'fake.readouts.count', 'fake.receive.dropped',
+                             'fake.receive.packets']
+    time.sleep(0.1)
+    second = client.statistics()
+    assert all(second[name] >= first[name] for name in first)
+    # the connection stays open, and does not prevent the EFU being asked to exit
+    assert efu.stop(timeout=5)
+    client.close()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='fake_efu.py is run directly as an executable')
+def test_collector(efu, capsys):
+    collector = EFUStatsCollector([efu], interval=0.1, report_interval=0.2)
+    collector.start()
+    time.sleep(0.5)
+    collector.stop()
+    totals = collector.totals('efu')
+    # the fake EFU counts about 1000 packets, 20000 readouts, 18000 events and 100 drops per second
+    assert 500 < totals['packets'] < 2000
+    assert totals['readouts'] > totals['events'] > totals['packets'] > totals['drops'] > 0
+    assert collector.counters['efu']['fake.receive.packets'] > 0
+    assert 'packets/s' in capsys.readouterr().out
@@ -1,5 +1,6 @@
 import multiprocessing
 import unittest
+import numpy
 
 
 def main_for_tests(instr: str, prefix: str):
@@ -57,5 +58,189 @@ class EPICSTestCase(unittest.TestCase):
             self.assertEqual(pv, value)
 
 
+class EPICSUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        from p4p.nt import NTScalar
+        from p4p.server import Server, StaticProvider
+        from p4p.server.thread import SharedPV
+        from p4p.client.thread import Context
+        from mccode_plumber.epics import MailboxHandler, group_pv, GROUP_NAME
+        self.provider = StaticProvider('test')
+        initial = {'a': NTScalar('d').wrap(0.0), 'b': NTScalar('i').wrap(0), 'c': NTScalar('s').wrap(''),
+                   'w': NTScalar('ad').wrap(numpy.zeros(1)), 'n': NTScalar('as').wrap([''])}
+        self.pvs = {n: SharedPV(initial=v, handler=MailboxHandler()) for n, v in initial.items()}
+        self.pvs[GROUP_NAME] = group_pv(dict(self.pvs), initial)
+        for name, pv in self.pvs.items():
+            self.provider.add(f'test:{name}', pv)
+        self.server = Server(providers=[self.provider], isolate=True)
+        self.ctx = Context('pva', conf=self.server.conf(), useenv=False)
+
+    def tearDown(self):
+        self.ctx.close()
+        self.server.stop()
+
+    def test_update_values(self):
+        from mccode_plumber.epics import update_values
+        values = {'test:a': '1.5', 'test:b': '2', 'test:c': 'three'}
+        results = update_values(values, self.ctx)
+        self.assertEqual(list(results), list(values))
+        self.assertTrue(all(r is None for r in results.values()))
+        self.assertEqual(self.ctx.get(list(values)), [1.5, 2, 'three'])
+
+    def test_update_values_failures(self):
+        from mccode_plumber.epics import update_values
+        results = update_values({'test:b': 'not-an-int', 'test:missing': '1', 'test:a': 4}, self.ctx, timeout=0.5)
+        self.assertIsInstance(results['test:b'], ValueError)
+        self.assertIsInstance(results['test:missing'], Exception)
+        self.assertIsNone(results['test:a'])
+        self.assertEqual(self.ctx.get('test:a'), 4.0)
+
+    def test_update_arrays(self):
+        from mccode_plumber.epics import update_values
+        mask = numpy.linspace(0, 1, 1000)
+        results = update_values({'test:w': mask, 'test:n': '[x, y]'}, self.ctx)
+        self.assertTrue(all(r is None for r in results.values()))
+        w, n = self.ctx.get(['test:w', 'test:n'])
+        self.assertTrue(numpy.array_equal(w, mask))
+        self.assertEqual(n, ['x', 'y'])
+        self.assertIsNone(update_values({'test:w': '[1, 2, 3]'}, self.ctx)['test:w'])
+        self.assertEqual(self.ctx.get('test:w').tolist(), [1.0, 2.0, 3.0])
+        self.assertIsInstance(update_values({'test:w': '[1, two]'}, self.ctx)['test:w'], ValueError)
+
+    def test_update_group(self):
+        from mccode_plumber.epics import update_group, GROUP_NAME
+        update_group(f'test:{GROUP_NAME}', {'a': '2.5', 'c': 'grouped'}, self.ctx)
+        a, b, c = self.ctx.get(['test:a', 'test:b', 'test:c'])
+        self.assertEqual((a, b, c), (2.5, 0, 'grouped'))
+        self.assertEqual(a.timestamp, c.timestamp)
+        self.assertNotEqual(a.timestamp, b.timestamp)
+
+    def test_update_group_array(self):
+        from mccode_plumber.epics import update_group, GROUP_NAME
+        update_group(f'test:{GROUP_NAME}', {'a': 1.0, 'w': numpy.arange(4.0)}, self.ctx)
+        self.assertEqual(self.ctx.get('test:w').tolist(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(update_group(f'test:{GROUP_NAME}', {'w': '[1,2]', 'b': '7'}, self.ctx),
+                         {'w': None, 'b': None})
+        w, b = self.ctx.get(['test:w', 'test:b'])
+        self.assertEqual((w.tolist(), b), ([1.0, 2.0], 7))
+        # One invalid value, or unknown name, prevents the whole update
+        for invalid in ({'a': '1.x'}, {'missing': 1}):
+            results = update_group(f'test:{GROUP_NAME}', {'w': '[3]', 'b': '8', **invalid}, self.ctx)
+            self.assertEqual(len(results), 3)
+            self.assertTrue(all(isinstance(result, ValueError) for result in results.values()))
+            self.assertIn(next(iter(invalid)), str(results['b']))
+            w, b, a = self.ctx.get(['test:w', 'test:b', 'test:a'])
+            self.assertEqual((w.tolist(), b, a), ([1.0, 2.0], 7, 1.0))
+
+    def test_record(self):
+        from pathlib import Path
+        from tempfile import TemporaryDirectory
+        from time import sleep
+        import h5py
+        from mccode_plumber.epics import update_values
+        from mccode_plumber.epics_recorder import PVRecorder
+        with TemporaryDirectory() as directory:
+            filename = Path(directory) / 'record.h5'
+            with PVRecorder(filename, 'test:', ['a', 'c', 'w'], ctx=self.ctx) as recorder:
+                sleep(0.2)
+                for i in (1, 1, 3):
+                    update_values({'test:a': i, 'test:c': f'v{i}', 'test:w': numpy.arange(i)}, self.ctx)
+                sleep(0.2)
+                self.assertEqual(recorder.flush(), 12)
+            with h5py.File(filename, 'r') as file:
+                self.assertEqual(file['a'].attrs['NX_class'], 'NXlog')
+                self.assertEqual(file['a/value'][()].tolist(), [0.0, 1.0, 1.0, 3.0])
+                self.assertTrue(all(numpy.diff(file['a/time'][()]) >= 0))
+                self.assertEqual([v.decode() for v in file['c/value'][()]], ['', 'v1', 'v1', 'v3'])
+                self.assertEqual([len(v) for v in file['w/value'][()]], [1, 1, 1, 3])
+
+
+class MailboxServiceTestCase(unittest.TestCase):
+    def test_add_remove(self):
+        from p4p.nt import NTScalar
+        from p4p.client.thread import Context
+        from mccode_plumber.epics import MailboxService, update_values
+        with MailboxService(isolate=True) as service:
+            service.add('one:', {'x': NTScalar('d').wrap(1.0)})
+            service.add('two:', {'x': NTScalar('i').wrap(2)}, filename_required=False)
+            with self.assertRaises(ValueError):
+                service.add('two:', {'y': NTScalar('d').wrap(0.0)})
+            ctx = Context('pva', conf=service.conf(), useenv=False)
+            self.assertEqual(ctx.get(['one:x', 'two:x', 'one:mcpl_filename']), [1.0, 2, ''])
+            self.assertIsNone(update_values({'two:x': '3'}, ctx)['two:x'])
+            self.assertEqual(ctx.get('two:x'), 3)
+            service.remove('one:')
+            self.assertEqual(list(service.sets), ['two:'])
+            ctx.close()
+            ctx = Context('pva', conf=service.conf(), useenv=False)
+            self.assertIsInstance(ctx.get('one:x', timeout=0.5, throw=False), Exception)
+            self.assertEqual(ctx.get('two:x'), 3)
+            ctx.close()
+
+    def test_serve_many(self):
+        from p4p.nt import NTScalar
+        from p4p.client.thread import Context
+        from mccode_plumber.epics import serve_many
+        sets = {f'{n}:': {'x': NTScalar('d').wrap(float(i))} for i, n in enumerate(('one', 'two', 'three'))}
+        service = serve_many(sets, isolate=True)
+        try:
+            ctx = Context('pva', conf=service.conf(), useenv=False)
+            self.assertEqual(ctx.get(['one:x', 'two:x', 'three:x', 'three:mcpl_filename']), [0.0, 1.0, 2.0, ''])
+            ctx.close()
+        finally:
+            service.stop()
+        with self.assertRaises(ValueError):
+            serve_many({'one:': {'_group': NTScalar('d').wrap(0.0)}}, isolate=True)
+
+
+class WatcherTestCase(unittest.TestCase):
+    def test_coalesced_refresh(self):
+        import asyncio
+        from time import monotonic
+        from unittest import mock
+        from p4p.client.thread import Disconnected
+        from mccode_plumber.epics_watcher import PVMonitorApp
+
+        async def scenario():
+            # A slow refresh rate, so that only the explicit refreshes update the widgets
+            app = PVMonitorApp('test:', ['a', 'b', 'c'], rate=0.001)
+            app.ctx = mock.Mock()
+            async with app.run_test():
+                a, b, c = (app.pv_widgets[f'test:{n}'] for n in 'abc')
+                for value in range(5):
+                    app.monitor_callback('test:a', value)
+                app.monitor_callback('test:b', 1.5)
+                app.monitor_callback('test:c', Disconnected())
+                # Rates are only computed once a full interval has passed
+                app.counts_since = monotonic() - 2.0
+                app.refresh_widgets()
+                self.assertEqual((a.value, b.value, c.value), ('4', '1.5', 'Disconnected'))
+                self.assertAlmostEqual(a.rate, 2.5, delta=0.1)
+                self.assertAlmostEqual(b.rate, 0.5, delta=0.1)
+                self.assertEqual(app.pending, {})
+                self.assertEqual(app.counts, {})
+                app.monitor_callback('test:b', 2.5)
+                app.refresh_widgets()
+                # Only the PV with a new value changes, and rates wait for the next interval
+                self.assertEqual((a.value, b.value), ('4', '2.5'))
+                self.assertAlmostEqual(a.rate, 2.5, delta=0.1)
+                self.assertEqual(app.counts, {'test:b': 1})
+            self.assertEqual(app.ctx.monitor.call_count, 3)
+
+        asyncio.run(scenario())
+
+    def test_positive_arguments(self):
+        from contextlib import redirect_stderr
+        from io import StringIO
+        from mccode_plumber.epics_watcher import get_instr_parser, get_names_parser
+        self.assertEqual(get_names_parser().parse_args(['a', '--rate', '2.5']).rate, 2.5)
+        self.assertEqual(get_names_parser().parse_args(['a', '--flush-interval', '0.5']).flush_interval, 0.5)
+        for value in ('0', '-1', 'inf', 'nan'):
+            for parser, args in ((get_names_parser(), ['a']), (get_instr_parser(), ['instr.instr'])):
+                for option in ('--rate', '--flush-interval'):
+                    with self.assertRaises(SystemExit), redirect_stderr(StringIO()):
+                        parser.parse_args(args + [option, value])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,283 @@
+import unittest
+
+
+class ForwarderRecordTestCase(unittest.TestCase):
+    def setUp(self):
+        from tempfile import TemporaryDirectory
+        from pathlib import Path
+        self.tmpdir = TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'record.json'
+        self.pvs = [dict(source=f'mcstas:{n}', module='f144', topic='parameters') for n in 'abc']
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_default_path(self):
+        from mccode_plumber.forwarder import ForwarderRecord
+        record = ForwarderRecord('localhost:9092', 'ForwardConfig')
+        self.assertEqual(record.path.name, 'forwarder_localhost_9092_ForwardConfig.json')
+        # Each user has their own directory, so one user's record can not block another's
+        from getpass import getuser
+        self.assertEqual(record.path.parent.name, f'mccode-plumber-{getuser()}')
+
+    def test_save_leaves_no_temporary_files(self):
+        from mccode_plumber.forwarder import ForwarderRecord
+        records = [ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path) for _ in range(2)]
+        for record in records:
+            record.add(self.pvs)
+            record.save()
+        self.assertEqual([p.name for p in self.path.parent.iterdir()], [self.path.name])
+
+    def test_round_trip(self):
+        from mccode_plumber.forwarder import ForwarderRecord
+        record = ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path)
+        self.assertEqual(record.pvs, {})
+        record.add(self.pvs)
+        record.save()
+        loaded = ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path)
+        self.assertEqual(list(loaded.pvs.values()), self.pvs)
+        loaded.clear()
+        self.assertEqual(ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path).pvs, {})
+
+    def test_difference(self):
+        from mccode_plumber.forwarder import ForwarderRecord
+        record = ForwarderRecord('localhost:9092', 'ForwardConfig', self.path)
+        record.add(self.pvs[:2])
+        self.assertEqual(record.missing(self.pvs), self.pvs[2:])
+        self.assertEqual(record.present(self.pvs), self.pvs[:2])
+        self.assertEqual(record.extra(self.pvs[1:]), self.pvs[:1])
+        # the same source sent to a different topic is a different stream
+        moved = dict(self.pvs[0], topic='elsewhere')
+        self.assertEqual(record.missing([moved]), [moved])
+        # only streams under the prefix are extra
+        other = dict(source='other:a', module='f144', topic='parameters')
+        record.add([other])
+        self.assertEqual(record.extra(self.pvs[1:]), self.pvs[:1] + [other])
+        self.assertEqual(record.extra(self.pvs[1:], 'mcstas:'), self.pvs[:1])
+
+    def test_locked(self):
+        from threading import Thread
+        from time import sleep
+        from mccode_plumber.forwarder import ForwarderRecord
+
+        def add(pv):
+            with ForwarderRecord.locked('localhost:9092', 'ForwardConfig', self.path) as record:
+                sleep(0.05)
+                record.add([pv])
+
+        threads = [Thread(target=add, args=(pv,)) for pv in self.pvs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Each change was made to the record saved by the previous one, so none is lost
+        record = ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path)
+        self.assertEqual(sorted(pv['source'] for pv in record.pvs.values()), [pv['source'] for pv in self.pvs])
+        with self.assertRaises(RuntimeError), \
+                ForwarderRecord.locked('localhost:9092', 'ForwardConfig', self.path) as record:
+            record.pvs = {}
+            raise RuntimeError('Not sent')
+        self.assertEqual(len(ForwarderRecord.load('localhost:9092', 'ForwardConfig', self.path).pvs), 3)
+
+    def test_policy_change(self):
+        from mccode_plumber.forwarder import ForwarderRecord
+        record = ForwarderRecord('localhost:9092', 'ForwardConfig', self.path)
+        record.add(self.pvs)
+        periodic = dict(self.pvs[0], periodic=True)
+        # a changed update policy needs the old stream removed and the new one added
+        self.assertEqual(record.missing([periodic] + self.pvs[1:]), [periodic])
+        self.assertEqual(record.extra([periodic] + self.pvs[1:]), self.pvs[:1])
+        self.assertEqual(record.missing([dict(self.pvs[0], periodic=False)]), [])
+
+
+class ForwarderRestartTestCase(unittest.TestCase):
+    def test_restore_streams(self):
+        from tempfile import TemporaryDirectory
+        from pathlib import Path
+        from unittest import mock
+        from mccode_plumber.forwarder import ForwarderRecord
+        from mccode_plumber.manage.forwarder import Forwarder
+        pvs = [dict(source=f'mcstas:{n}', module='f144', topic='parameters') for n in 'ab']
+        with TemporaryDirectory() as tmpdir, \
+                mock.patch('mccode_plumber.forwarder._record_directory', return_value=Path(tmpdir)):
+            record = ForwarderRecord.load('localhost:9092', 'ForwardConfig')
+            record.add(pvs)
+            record.save()
+            # A restarted Forwarder, without its Kafka topic registration
+            forwarder = Forwarder.__new__(Forwarder)
+            forwarder.name, forwarder.retrieve, forwarder._config = 'FWD', False, 'localhost:9092/ForwardConfig'
+            with mock.patch.object(Forwarder, 'readiness_probe', return_value=lambda: True), \
+                    mock.patch('mccode_plumber.forwarder.configure_forwarder') as configure:
+                forwarder._restore_streams()
+            configure.assert_called_once_with(pvs, 'localhost:9092/ForwardConfig')
+            # The record is cleared, since configure_forwarder records the re-sent streams itself
+            self.assertEqual(ForwarderRecord.load('localhost:9092', 'ForwardConfig').pvs, {})
+
+
+class ForwarderUpdateTestCase(unittest.TestCase):
+    class Producer:
+        """Records produced messages; those after the first `delivered` are left undelivered, or fail"""
+        def __init__(self, delivered=None, error=None):
+            self.messages = []
+            self.flushed = 0
+            self.delivered = delivered
+            self.error = error
+            self.callbacks = []
+
+        def produce(self, topic, message, on_delivery=None):
+            self.messages.append((topic, message))
+            self.callbacks.append(on_delivery)
+
+        def flush(self, timeout=None):
+            self.flushed += 1
+            undelivered = 0
+            for index, callback in enumerate(self.callbacks):
+                if self.delivered is None or index < self.delivered:
+                    callback(None, None)
+                elif self.error is not None:
+                    callback(self.error, None)
+                else:
+                    undelivered += 1
+            self.callbacks = []
+            return undelivered
+
+    def setUp(self):
+        self.pvs = [dict(source=f'mcstas:{n}', module='f144', topic='parameters') for n in 'abcde']
+
+    def send(self, chunk):
+        from unittest import mock
+        from streaming_data_types.fbschemas.forwarder_config_update_fc00.UpdateType import UpdateType
+        from mccode_plumber.forwarder import _send_forwarder_update
+        producer = self.Producer()
+        with mock.patch('mccode_plumber.kafka.get_producer', return_value=producer) as get_producer:
+            _send_forwarder_update('localhost:9092', 'ForwardConfig', UpdateType.ADD, self.pvs, chunk)
+        get_producer.assert_called_once_with('localhost:9092')
+        return producer
+
+    def test_chunks(self):
+        from streaming_data_types.forwarder_config_update_fc00 import deserialise_fc00
+        producer = self.send(2)
+        self.assertEqual(producer.flushed, 1)
+        self.assertEqual([topic for topic, _ in producer.messages], ['ForwardConfig'] * 3)
+        sources = [sorted(s.channel for s in deserialise_fc00(m).streams) for _, m in producer.messages]
+        self.assertEqual(sources, [['mcstas:a', 'mcstas:b'], ['mcstas:c', 'mcstas:d'], ['mcstas:e']])
+
+    def test_one_message(self):
+        from streaming_data_types.forwarder_config_update_fc00 import deserialise_fc00
+        producer = self.send(None)
+        self.assertEqual(len(producer.messages), 1)
+        self.assertEqual(len(deserialise_fc00(producer.messages[0][1]).streams), 5)
+
+    def test_synchronise_keeps_other_prefixes(self):
+        from tempfile import TemporaryDirectory
+        from pathlib import Path
+        from unittest import mock
+        from streaming_data_types.forwarder_config_update_fc00 import deserialise_fc00
+        from streaming_data_types.fbschemas.forwarder_config_update_fc00.UpdateType import UpdateType
+        from mccode_plumber.forwarder import ForwarderRecord, synchronise_forwarder
+        other = [dict(source=f'other:{n}', module='f144', topic='parameters') for n in 'ab']
+        producer = self.Producer()
+        with TemporaryDirectory() as tmpdir, \
+                mock.patch('mccode_plumber.forwarder._record_directory', return_value=Path(tmpdir)), \
+                mock.patch('mccode_plumber.kafka.get_producer', return_value=producer):
+            synchronise_forwarder(other, 'localhost:9092/ForwardConfig', prefix='other:')
+            synchronise_forwarder(self.pvs, 'localhost:9092/ForwardConfig', prefix='mcstas:')
+            synchronise_forwarder(self.pvs[:2], 'localhost:9092/ForwardConfig', prefix='mcstas:')
+            record = ForwarderRecord.load('localhost:9092', 'ForwardConfig')
+        # The last synchronisation removes only the streams of its own prefix which it no longer needs
+        update = deserialise_fc00(producer.messages[-1][1])
+        self.assertEqual(update.config_change, UpdateType.REMOVE)
+        self.assertEqual(sorted(s.channel for s in update.streams), ['mcstas:c', 'mcstas:d', 'mcstas:e'])
+        self.assertEqual(sorted(pv['source'] for pv in record.pvs.values()),
+                         ['mcstas:a', 'mcstas:b', 'other:a', 'other:b'])
+
+    def test_undelivered(self):
+        from tempfile import TemporaryDirectory
+        from pathlib import Path
+        from unittest import mock
+        from mccode_plumber.forwarder import ForwarderRecord, synchronise_forwarder
+        producers = [self.Producer(delivered=1), self.Producer(delivered=1, error='Broker unreachable'),
+                     self.Producer()]
+        with TemporaryDirectory() as tmpdir, \
+                mock.patch('mccode_plumber.forwarder._record_directory', return_value=Path(tmpdir)), \
+                mock.patch('mccode_plumber.kafka.get_producer', side_effect=producers):
+            for producer, message in zip(producers, ('not delivered', 'Broker unreachable')):
+                with self.assertRaisesRegex(RuntimeError, message):
+                    synchronise_forwarder(self.pvs, 'localhost:9092/ForwardConfig', chunk=2)
+                self.assertEqual(len(producer.messages), 3)
+                # Nothing is recorded as configured, so the next synchronisation sends every stream again
+                self.assertEqual(ForwarderRecord.load('localhost:9092', 'ForwardConfig').pvs, {})
+            synchronise_forwarder(self.pvs, 'localhost:9092/ForwardConfig', chunk=2)
+            self.assertEqual(len(producers[-1].messages), 3)
+            self.assertEqual(len(ForwarderRecord.load('localhost:9092', 'ForwardConfig').pvs), 5)
+
+    def test_invalid_chunk(self):
+        from unittest import mock
+        from mccode_plumber.forwarder import ForwarderRecord, configure_forwarder
+        for chunk in (0, -2):
+            with self.assertRaises(ValueError):
+                self.send(chunk)
+            # Nothing is sent, so nothing may be recorded as configured
+            with mock.patch.object(ForwarderRecord, 'save') as save, self.assertRaises(ValueError):
+                configure_forwarder(self.pvs, 'localhost:9092/ForwardConfig', chunk=chunk)
+            save.assert_not_called()
+
+
+class ForwarderPolicyTestCase(unittest.TestCase):
+    def test_partial_streams(self):
+        from mccode_antlr.loader.loader import parse_mccode_instr_parameters
+        from mccode_plumber.forwarder import forwarder_partial_streams, streams, UpdatePolicy
+        instr = 'define instrument blah(par1, double par2, int par3=1, string par4="string") trace end'
+        parameters = parse_mccode_instr_parameters(instr)
+        pvs = forwarder_partial_streams('mcstas:', 'parameters', parameters, {'par2': UpdatePolicy.PERIODIC})
+        self.assertEqual([pv['source'] for pv in pvs], ['mcstas:par1', 'mcstas:par2', 'mcstas:par3'])
+        self.assertEqual([s.periodic for s in streams(pvs)], [0, 1, 0])
+        pvs = forwarder_partial_streams('mcstas:', 'parameters', parameters, policy=UpdatePolicy.PERIODIC)
+        self.assertTrue(all(pv['periodic'] for pv in pvs))
+
+
+class ForwarderStatusTestCase(unittest.TestCase):
+    def test_status_streams(self):
+        from json import dumps
+        from mccode_plumber.forwarder import forwarder_status_streams, stream_key
+        pv = dict(source='mcstas:a', module='f144', topic='parameters')
+        status = dumps({'streams': [
+            {'channel_name': 'mcstas:a', 'protocol': 'PVA', 'output_topic': 'parameters', 'schema': 'f144'},
+            {'channel_name': 'mcstas:b', 'protocol': 'PVA', 'output_topic': 'parameters', 'schema': 'f144'},
+        ]})
+        streams = forwarder_status_streams(status)
+        self.assertEqual(len(streams), 2)
+        self.assertIn(stream_key(pv), streams)
+        self.assertEqual(forwarder_status_streams(''), set())
+
+    def test_unavailable_status_topic(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from confluent_kafka import KafkaError, KafkaException
+        from mccode_plumber.forwarder import verify_forwarder
+
+        class Consumer:
+            closed = 0
+
+            def __init__(self, config):
+                pass
+
+            def list_topics(self, topic, timeout=None):
+                if topics is None:
+                    raise KafkaException(KafkaError(KafkaError._TRANSPORT))
+                return SimpleNamespace(topics=topics)
+
+            def close(self):
+                Consumer.closed += 1
+
+        pvs = [dict(source='mcstas:a', module='f144', topic='parameters')]
+        failed = SimpleNamespace(partitions={}, error=KafkaError(KafkaError.UNKNOWN_TOPIC_OR_PART))
+        for topics in ({}, {'ForwardStatus': failed}, None):
+            with mock.patch('confluent_kafka.Consumer', Consumer), mock.patch('builtins.print') as printed:
+                self.assertFalse(verify_forwarder(pvs, 'localhost:9092/ForwardConfig', 'localhost:9092/ForwardStatus'))
+            self.assertIn('ForwardStatus is not available', printed.call_args.args[0])
+        self.assertEqual(Consumer.closed, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
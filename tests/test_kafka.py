@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch
+
+
+class FakeFuture:
+    def __init__(self, error=None):
+        self.error = error
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+
+
+class FakeAdminClient:
+    """Stands in for a confluent_kafka AdminClient, recording every request"""
+    def __init__(self, topics: dict[str, int], reachable: bool = True):
+        self.topics = dict(topics)
+        self.reachable = reachable
+        self.listed = 0
+        self.created: list[str] = []
+
+    def list_topics(self, timeout=None):
+        from types import SimpleNamespace
+        from confluent_kafka import KafkaError, KafkaException
+        self.listed += 1
+        if not self.reachable:
+            raise KafkaException(KafkaError(KafkaError._TRANSPORT))
+        return SimpleNamespace(topics={n: SimpleNamespace(partitions=dict.fromkeys(range(p)))
+                                       for n, p in self.topics.items()})
+
+    def create_topics(self, new_topics):
+        from confluent_kafka import KafkaError, KafkaException
+        futures = {}
+        for new in new_topics:
+            self.created.append(new.topic)
+            if not self.reachable:
+                futures[new.topic] = FakeFuture(KafkaException(KafkaError(KafkaError._TRANSPORT)))
+            elif new.topic in self.topics:
+                futures[new.topic] = FakeFuture(KafkaException(KafkaError(KafkaError.TOPIC_ALREADY_EXISTS)))
+            else:
+                self.topics[new.topic] = new.num_partitions
+                futures[new.topic] = FakeFuture()
+        return futures
+
+
+class RegisterTopicsTestCase(unittest.TestCase):
+    broker = 'fake-broker:9092'
+
+    def setUp(self):
+        from mccode_plumber.kafka import forget_kafka_broker
+        forget_kafka_broker(self.broker)
+        self.admin = FakeAdminClient({'existing': 1})
+        patcher = patch('mccode_plumber.kafka.get_admin_client', lambda broker: self.admin)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(forget_kafka_broker, self.broker)
+
+    def register(self, topics, **kwargs):
+        from mccode_plumber.kafka import register_kafka_topics
+        return register_kafka_topics(self.broker, topics, **kwargs)
+
+    def test_known_topics_not_created(self):
+        from mccode_plumber.kafka import KafkaTopic
+        self.assertEqual(self.register(['existing']), {'existing': KafkaTopic.EXISTS})
+        self.assertEqual(self.admin.listed, 1)
+        self.assertEqual(self.admin.created, [])
+        # Now cached, so the broker is not asked again
+        self.assertEqual(self.register(['existing']), {'existing': KafkaTopic.EXISTS})
+        self.assertEqual(self.admin.listed, 1)
+        self.assertEqual(self.admin.created, [])
+
+    def test_created_topics_are_cached(self):
+        from mccode_plumber.kafka import KafkaTopic, TopicProfile
+        results = self.register(['existing', 'new'], profiles={'new': TopicProfile(partitions=3)})
+        self.assertEqual(results, {'existing': KafkaTopic.EXISTS, 'new': KafkaTopic.CREATED})
+        self.assertEqual(self.admin.created, ['new'])
+        self.assertEqual(self.register(['new']), {'new': KafkaTopic.EXISTS})
+        self.assertEqual(self.admin.listed, 1)
+        self.assertEqual(self.admin.created, ['new'])
+
+    def test_unknown_topic_refreshes(self):
+        from mccode_plumber.kafka import KafkaTopic
+        self.register(['existing'])
+        # Another client creates a topic, which only a refresh of the metadata finds
+        self.admin.topics['elsewhere'] = 2
+        self.assertEqual(self.register(['existing', 'elsewhere']),
+                         {'existing': KafkaTopic.EXISTS, 'elsewhere': KafkaTopic.EXISTS})
+        self.assertEqual(self.admin.listed, 2)
+        self.assertEqual(self.admin.created, [])
+
+    def test_unreachable_broker(self):
+        from confluent_kafka import KafkaError
+        from mccode_plumber.kafka import known_kafka_topics
+        self.admin.reachable = False
+        self.assertEqual(known_kafka_topics(self.broker), {})
+        # With nothing known every topic is requested, and the failure reported per topic
+        self.assertEqual(self.register(['existing', 'new']),
+                         {'existing': KafkaError._TRANSPORT, 'new': KafkaError._TRANSPORT})
+        self.assertEqual(self.admin.created, ['existing', 'new'])
+
+    def test_unreachable_broker_keeps_cache(self):
+        from mccode_plumber.kafka import KafkaTopic, known_kafka_topics
+        self.register(['existing'])
+        self.admin.reachable = False
+        self.assertEqual(known_kafka_topics(self.broker, refresh=True), {'existing': 1})
+        self.assertEqual(self.register(['existing']), {'existing': KafkaTopic.EXISTS})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import time
+
+from mccode_plumber.manage.logs import LineThrottle, RotatingLog
+from mccode_plumber.manage.manager import IOType
+
+from .managers import PRINTER, Script
+
+
+def test_rotating_log(tmp_path):
+    path = tmp_path / 'service.log'
+    log = RotatingLog(path, max_bytes=1000, backups=2, compress=True, flush_interval=0.05)
+    for i in range(100):
+        log.write(IOType.stdout, 'info', f'line {i}\n')
+    log.write(IOType.stderr, 'error', 'last line\n')
+    log.close()
+    log.write(IOType.stdout, 'info', 'after closing\n')
+    # Each line is about 50 bytes, so only the newest 2 of several rotated files are kept
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['service.log', 'service.log.1.gz', 'service.log.2.gz']
+    import gzip
+    rotated = [gzip.open(tmp_path / f'service.log.{n}.gz', 'rt').read() for n in (2, 1)]
+    assert all(0 < len(text) <= 1000 + 50 for text in rotated)
+    records = [line.split(' ', 3) for text in rotated + [path.read_text()] for line in text.splitlines()]
+    timestamp, stream, level, text = records[-1]
+    assert (stream, level, text) == ('stderr', 'error', 'last line')
+    assert timestamp.endswith('+00:00')
+    # The kept lines are the newest, in order
+    first = 101 - len(records)
+    assert [r[1:] for r in records[:-1]] == [['stdout', 'info', f'line {i}'] for i in range(first, 100)]
+    assert 'after closing' not in path.read_text()
+
+def test_rotating_log_flushes(tmp_path):
+    path = tmp_path / 'service.log'
+    log = RotatingLog(path, flush_interval=0.05)
+    log.write(IOType.stdout, 'info', 'hello\n')
+    end = time.monotonic() + 5
+    while not path.read_text() and time.monotonic() < end:
+        time.sleep(0.01)
+    assert path.read_text().endswith(' stdout info hello\n')
+    log.close()
+
+
+def test_line_throttle():
+    throttle = LineThrottle(rate=10)
+    assert sum(throttle.allow() for _ in range(100)) == 10
+    assert throttle.take_suppressed() == 90 and throttle.take_suppressed() == 0
+    assert all(LineThrottle().allow() for _ in range(100))
+    disabled = LineThrottle(rate=0)
+    assert disabled.disabled and not disabled.allow()
+
+
+def test_manager_log(tmp_path, capsys):
+    from mccode_plumber.manage.manager import Triage
+    log = RotatingLog(tmp_path / 'printer.log')
+    manager = Script.start(name='printer', script=PRINTER, triage=Triage(ignore=['ignore']), log=log, terminal=LineThrottle(0))
+    manager._process.wait()
+    manager.stop()
+    records = [line.split(' ', 3)[1:] for line in (tmp_path / 'printer.log').read_text().splitlines()]
+    # Levels filtered from the terminal are still logged, but ignored lines are not
+    assert sorted(records) == [['stderr', 'error', 'an error'], ['stdout', 'debug', 'debug noise'],
+                               ['stdout', 'default', 'hello']]
+    time.sleep(0.1)
+    assert 'printer' not in capsys.readouterr().out
@@ -67,3 +67,46 @@ def test_minimal_efu_management():
     assert service.poll()
     assert assert_faker_working(service.command, "test_management")
     service.stop()
+
+
+def test_efu_pool(tmp_path):
+    from mccode_plumber.manage.efu import EventFormationUnitConfig, efu_pool, save_efu_shards, load_efu_shards
+    here = Path(__file__)
+    config = EventFormationUnitConfig.from_dict(
+        {'name': 'loki', 'binary': here, 'config': here, 'calibration': here, 'topic': 'LokiEvents', 'port': 9000}
+    )
+    configs, shards = efu_pool(config, 3)
+    assert [c.name for c in configs] == ['loki0', 'loki1', 'loki2']
+    assert len({c.port for c in configs}) == 3 and 9000 not in shards.ports
+    assert all(c.topic == 'LokiEvents' and c.samples_topic == 'LokiEvents_samples' for c in configs)
+    assert shards.port(4) == configs[1].port
+
+    configs, shards = efu_pool(config, 2, per_topic=True)
+    assert [c.topic for c in configs] == shards.topics == ['LokiEvents_0', 'LokiEvents_1']
+    assert [c.samples_topic for c in configs] == ['LokiEvents_0_samples', 'LokiEvents_1_samples']
+
+    save_efu_shards(tmp_path / 'shards.json', [shards])
+    assert load_efu_shards(tmp_path / 'shards.json') == {'loki': shards}
+    with pytest.raises(ValueError):
+        efu_pool(config, 0)
+
+
+def test_shard_parameters():
+    from mccode_antlr.loader.loader import parse_mccode_instr_parameters
+    from mccode_antlr.run.range import parse_scan_parameters
+    from mccode_plumber.manage.efu import EventFormationUnitShards
+    from mccode_plumber.manage.orchestrate import shard_parameters
+    instr_parameters = parse_mccode_instr_parameters(
+        'define instrument blah(int loki_port=9000, int bifrost_port=9001, a) trace end'
+    )
+    parameters = parse_scan_parameters(['a=1:3'])
+    shards = {
+        'loki': EventFormationUnitShards('loki', 'localhost', [10000, 10001], ['LokiEvents'] * 2),
+        'bifrost': EventFormationUnitShards('bifrost', 'localhost', [20000], ['BifrostEvents']),
+    }
+    sharded = shard_parameters(instr_parameters, parameters, shards, 1)
+    assert sharded['loki_port'].value == 10001 and sharded['bifrost_port'].value == 20000
+    assert sharded['a'] is parameters['a'] and 'loki_port' not in parameters
+    with pytest.raises(ValueError, match='port'):
+        shard_parameters(parse_mccode_instr_parameters('define instrument blah(int port=1) trace end'),
+                         parameters, shards, 0)
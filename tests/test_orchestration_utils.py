@@ -62,5 +62,56 @@ def test_monitor_streams():
     assert sources == {f'{x}_monitor' for x in ['psc', 'overlap', 'bandwidth', 'normalization']}
 
 
+def test_iter_streams_paths_and_modules():
+    from mccode_plumber.manage.orchestrate import iter_streams, index_streams_by_topic
+    da00 = dict(module='da00', config=dict(topic='mon', source='m0'))
+    f144 = dict(module='f144', config=dict(topic='log', source='p0', type='double'))
+    monitor = dict(name='m0', type='group', children=[da00])
+    instrument = dict(name='instrument', type='group', children=[monitor, monitor])
+    entry = dict(name='entry', type='group', children=[instrument, f144])
+    records = list(iter_streams(dict(children=[entry])))
+    assert [(r.topic, r.source, r.path, r.module) for r in records] == [
+        ('mon', 'm0', '/entry/instrument/m0', 'da00'),
+        ('mon', 'm0', '/entry/instrument/m0', 'da00'),
+        ('log', 'p0', '/entry', 'f144'),
+    ]
+    index = index_streams_by_topic(dict(children=[entry]))
+    assert list(index) == ['mon', 'log']
+    assert [r.source for r in index['mon']] == ['m0']
+
+
+def test_iter_streams_deep_structure():
+    import sys
+    from mccode_plumber.manage.orchestrate import iter_streams, get_stream_pairs
+    depth = 10 * sys.getrecursionlimit()
+    structure = dict(topic='deep', source='bottom')
+    for i in range(depth):
+        structure = dict(name=f'g{i}', type='group', children=[structure])
+    records = list(iter_streams(structure))
+    assert len(records) == 1
+    assert records[0].path.count('/') == depth
+    assert get_stream_pairs(structure) == [('deep', 'bottom')]
+
+
+def test_topic_profiles_by_role():
+    from mccode_plumber.manage.orchestrate import topic_profiles, TOPICS
+    profiles = topic_profiles({'event': 'ev', 'monitor': 'mon', 'config': TOPICS['config']}, {'event': 8})
+    assert profiles['ev'].partitions == 8
+    assert profiles['mon'].partitions > 1
+    assert profiles[TOPICS['config']].partitions == 1
+    assert profiles['ev'].config() == {'max.message.bytes': '104857600'}
+
+
+def test_pooled_partitions():
+    from mccode_plumber.kafka import TOPIC_PROFILES
+    from mccode_plumber.manage.orchestrate import pooled_partitions
+    default = TOPIC_PROFILES['events'].partitions
+    # A small pool keeps the profile's partitions, rather than reducing them
+    assert pooled_partitions(None, 2) == default
+    assert pooled_partitions(None, default + 3) == default + 3
+    assert pooled_partitions(8, 2) == 8
+    assert pooled_partitions(1, 2) == 2
+
+
 if __name__ == '__main__':
     test_monitor_streams()
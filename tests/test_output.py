@@ -0,0 +1,118 @@
+import sys
+import time
+from subprocess import Popen, PIPE
+
+import pytest
+
+from mccode_plumber.manage.manager import IOType
+from mccode_plumber.manage.output import OutputReader, ThreadedOutputReader
+
+SCRIPT = """
+import sys
+for i in range(20000):
+    print(f'out {i}')
+sys.stderr.write('err 0\\r\\nerr 1\\n')
+sys.stdout.write('no newline')
+"""
+
+
+class CollectingSink:
+    def __init__(self):
+        self.texts = {IOType.stdout: [], IOType.stderr: []}
+
+    def write(self, io_type, texts):
+        self.texts[io_type].extend(texts)
+
+    def wait_for(self, io_type, count, timeout=10.0):
+        end = time.monotonic() + timeout
+        while len(self.texts[io_type]) < count and time.monotonic() < end:
+            time.sleep(0.01)
+        return self.texts[io_type]
+
+
+@pytest.mark.parametrize('reader_type', [OutputReader, ThreadedOutputReader])
+def test_output_reader_lines(reader_type):
+    sink = CollectingSink()
+    reader = reader_type(sink)
+    procs = [Popen([sys.executable, '-c', SCRIPT], stdout=PIPE, stderr=PIPE, bufsize=0) for _ in range(3)]
+    for n, proc in enumerate(procs):
+        # Ignore even-numbered lines of stdout, and prefix all others with the process number
+        reader.add(proc.stdout, IOType.stdout, lambda line, n=n: None if line[-2] in '02468' else f'{n} {line}')
+        reader.add(proc.stderr, IOType.stderr, lambda line, n=n: f'{n} {line}')
+    for proc in procs:
+        proc.wait()
+    out = sink.wait_for(IOType.stdout, 3 * 10001)
+    err = sink.wait_for(IOType.stderr, 3 * 2)
+    for n in range(3):
+        lines = [line for line in out if line.startswith(f'{n} ')]
+        assert lines == [f'{n} out {i}\n' for i in range(1, 20000, 2)] + [f'{n} no newline\n']
+        assert [line for line in err if line.startswith(f'{n} ')] == [f'{n} err 0\n', f'{n} err 1\n']
+    assert all(proc.stdout.closed and proc.stderr.closed for proc in procs)
+
+
+
+class FailingSink(CollectingSink):
+    """Fails to write the first batch of lines for each stream"""
+    def __init__(self):
+        super().__init__()
+        self.failed = set()
+
+    def write(self, io_type, texts):
+        if io_type not in self.failed:
+            self.failed.add(io_type)
+            raise BrokenPipeError('The first write fails')
+        super().write(io_type, texts)
+
+
+@pytest.mark.parametrize('reader_type', [OutputReader, ThreadedOutputReader])
+def test_output_reader_errors(reader_type, capsys):
+    sink = FailingSink()
+    reader = reader_type(sink)
+    good, bad = (Popen([sys.executable, '-c', SCRIPT], stdout=PIPE, stderr=PIPE, bufsize=0) for _ in range(2))
+
+    def broken(line):
+        raise RuntimeError('Broken handler')
+
+    reader.add(good.stdout, IOType.stdout, lambda line: line, 'good')
+    reader.add(good.stderr, IOType.stderr, lambda line: line, 'good')
+    reader.add(bad.stdout, IOType.stdout, broken, 'bad')
+    reader.add(bad.stderr, IOType.stderr, lambda line: line, 'bad')
+    # The bad process is not blocked writing to its closed stdout pipe
+    bad.wait(10)
+    good.wait(10)
+    out = sink.wait_for(IOType.stdout, 1)
+    end = time.monotonic() + 10
+    while (not out or out[-1] != 'no newline\n') and time.monotonic() < end:
+        time.sleep(0.01)
+    # Lines after the failed write are all delivered
+    assert out[-1] == 'no newline\n' and all(line.startswith('out ') for line in out[:-1])
+    reported = capsys.readouterr().err
+    assert "Stopped reading the stdout of bad: RuntimeError('Broken handler')" in reported
+    assert reported.count('could not be written to stdout') == 1
+    assert bad.stdout.closed and good.stdout.closed
+
+
+def test_shared_output_reader(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from mccode_plumber.manage import output
+    monkeypatch.setattr(output, '_SHARED_READER', None)
+    with ThreadPoolExecutor(8) as pool:
+        readers = list(pool.map(lambda _: output.shared_output_reader(), range(32)))
+    assert all(reader is readers[0] for reader in readers)
+
+
+def test_manager_output(capsys):
+    from mccode_plumber.manage.manager import Triage
+    from .managers import PRINTER, Script
+    manager = Script.start(name='printer', script=PRINTER, triage=Triage(styles={}))
+    manager._process.wait()
+    out, err = '', ''
+    end = time.monotonic() + 10
+    while 'an error' not in err and time.monotonic() < end:
+        time.sleep(0.01)
+        captured = capsys.readouterr()
+        out, err = out + captured.out, err + captured.err
+    # the debug line is filtered by the default Triage level
+    assert 'printer: hello' in out.replace('\x1b[0m', '')
+    assert 'printer: debug noise' not in out.replace('\x1b[0m', '')
+    assert 'printer: an error' in err.replace('\x1b[0m', '')
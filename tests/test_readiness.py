@@ -0,0 +1,66 @@
+import sys
+from dataclasses import dataclass
+from functools import partial
+
+import pytest
+
+from mccode_plumber.manage.manager import Manager
+from mccode_plumber.manage.readiness import ServiceStartup
+
+from .managers import Sleeper, fake_efu_arguments
+
+
+@dataclass
+class NeverReady(Sleeper):
+    def readiness_probe(self):
+        return lambda: False
+
+
+@dataclass
+class Broken(Manager):
+    def __post_init__(self):
+        raise RuntimeError('Can not set up this service')
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='fake_efu.py is run directly as an executable')
+def test_startup_ready():
+    from mccode_plumber.manage import EventFormationUnit
+    startup = ServiceStartup(interval=0.05)
+    efu, sleeper = startup.start([
+        partial(EventFormationUnit.start, name='EFU', **fake_efu_arguments()),
+        partial(Sleeper.start, name='sleeper', seconds=30),
+    ])
+    try:
+        assert startup.wait(10)
+        report = startup.report()
+        assert 'EFU: started after' in report and 'sleeper: started after' in report
+        assert report.count('ready after') == 2
+        assert startup.ready_times[0] >= startup.start_times[0]
+    finally:
+        efu.stop()
+        sleeper.stop()
+
+
+def test_startup_exited():
+    from time import monotonic
+    startup = ServiceStartup(interval=0.05)
+    startup.start([partial(NeverReady.start, name='quick', seconds=0.2)])
+    start = monotonic()
+    # The probe of a service which exits finishes, so waiting does not take the full timeout
+    assert not startup.wait(10)
+    assert monotonic() - start < 5
+    assert 'quick: started after' in startup.report()
+    assert 'exited before it was ready' in startup.report()
+
+
+def test_startup_failure_stops_others():
+    startup = ServiceStartup()
+    started = []
+
+    def start_sleeper():
+        started.append(Sleeper.start(name='sleeper', seconds=30))
+        return started[-1]
+
+    with pytest.raises(RuntimeError, match='Can not set up'):
+        startup.start([start_sleeper, partial(Broken.start, name='broken')])
+    assert len(started) == 1 and not started[0].poll()
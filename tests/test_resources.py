@@ -0,0 +1,40 @@
+import os
+import time
+
+import pytest
+
+from mccode_plumber.manage.resources import ResourceSampler, read_proc
+from mccode_plumber.manage.logs import LineThrottle
+
+from .managers import Script
+
+pytestmark = pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason='requires a /proc filesystem')
+
+
+def test_read_proc():
+    cpu, rss, threads = read_proc(os.getpid())
+    assert cpu > 0 and rss > 0 and threads >= 1
+    assert read_proc(-1) is None
+
+
+def test_sampler():
+    busy = Script.start(name='busy', script='while True: print("busy")', terminal=LineThrottle(0))
+    idle = Script.start(name='idle', script='import time; time.sleep(30)')
+    sampler = ResourceSampler([busy, idle], interval=0.1)
+    try:
+        sampler.start()
+        time.sleep(1.0)
+        sampler.stop()
+    finally:
+        busy.stop()
+        idle.stop()
+    for name in ('busy', 'idle'):
+        samples = sampler.series(name)
+        assert len(samples) >= 5
+        assert all(s.rss > 0 and s.threads >= 1 for s in samples)
+        assert [s.time for s in samples] == sorted(s.time for s in samples)
+    latest = sampler.latest()
+    assert latest['busy'].cpu > 0.3 > latest['idle'].cpu
+    assert latest['busy'].output > 0 and latest['idle'].output == 0
+    summary = sampler.summary().splitlines()
+    assert len(summary) == 3 and summary[1].lstrip().startswith('busy')
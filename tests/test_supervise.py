@@ -0,0 +1,127 @@
+import sys
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from mccode_plumber.manage.manager import IOType, Manager, RestartMode, RestartPolicy
+from mccode_plumber.manage.supervise import ProcessWatcher, supervise
+
+from .managers import Sleeper
+
+
+@dataclass
+class Crasher(Manager):
+    status: int
+
+    def __run_command__(self) -> list[str]:
+        return [sys.executable, '-c', f'import sys; sys.exit({self.status})']
+
+
+@pytest.mark.parametrize('pidfd', [True, False])
+def test_process_watcher(monkeypatch, pidfd):
+    import os
+    if not pidfd:
+        monkeypatch.delattr(os, 'pidfd_open', raising=False)
+    short = Sleeper.start(name='short', seconds=0.5)
+    long = Sleeper.start(name='long', seconds=30)
+    watcher = ProcessWatcher([short, long])
+    try:
+        assert watcher.wait(timeout=0.01) == []
+        start = time.monotonic()
+        exited = watcher.wait(timeout=10)
+        assert exited == [short]
+        # Woken by the exit, not after a fixed interval
+        assert time.monotonic() - start < 2
+        assert not short.poll() and long.poll()
+        long.stop()
+        assert watcher.wait(timeout=10) == [long]
+    finally:
+        watcher.close()
+        long.stop()
+
+
+def test_process_watcher_already_exited():
+    done = Sleeper.start(name='done', seconds=0)
+    done._process.wait()
+    watcher = ProcessWatcher([done])
+    assert watcher.wait(timeout=1) == [done]
+    watcher.close()
+
+
+def test_restart_policy():
+    policy = RestartPolicy(RestartMode.on_failure, max_restarts=3, backoff=0.5, max_backoff=1.5)
+    assert policy.wanted(1) and not policy.wanted(0)
+    delays = []
+    for policy.count in range(3):
+        delays.append(policy.delay())
+    assert delays == [0.5, 1.0, 1.5]
+    policy.count = 3
+    assert not policy.wanted(1)
+    assert RestartPolicy(RestartMode.always, max_restarts=None, count=100).wanted(0)
+    assert not RestartPolicy().wanted(1)
+
+
+def test_supervise_restarts():
+    crasher = Crasher.start(name='crasher', status=3,
+                            restart=RestartPolicy(RestartMode.on_failure, max_restarts=2, backoff=0.1))
+    long = Sleeper.start(name='long', seconds=30)
+    try:
+        start = time.monotonic()
+        assert supervise([crasher, long]) == [crasher]
+        # restarted twice, after 0.1 and then 0.2 seconds, then left stopped
+        assert crasher.restart.count == 2
+        assert 0.3 <= crasher.restart.downtime < time.monotonic() - start
+        assert crasher._process.returncode == 3 and long.poll()
+    finally:
+        long.stop()
+
+
+def test_supervise_on_failure_only():
+    done = Crasher.start(name='done', status=0, restart=RestartPolicy(RestartMode.on_failure, backoff=0.1))
+    assert supervise([done]) == [done]
+    assert done.restart.count == 0
+
+
+@dataclass
+class Stubborn(Manager):
+    def __run_command__(self) -> list[str]:
+        script = ("import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                  "print('ready', flush=True); time.sleep(30)")
+        return [sys.executable, '-c', script]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='SIGTERM can not be ignored on Windows')
+def test_shutdown_kills_after_deadline():
+    from mccode_plumber.manage.supervise import ServiceShutdown
+    stubborn = [Stubborn.start(name=f'stubborn{i}') for i in range(3)]
+    polite = Sleeper.start(name='polite', seconds=30)
+    # Wait until the stubborn processes ignore SIGTERM
+    end = time.monotonic() + 10
+    while any(s._output_chars[IOType.stdout] == 0 for s in stubborn) and time.monotonic() < end:
+        time.sleep(0.01)
+    shutdown = ServiceShutdown(timeout=0.5)
+    start = time.monotonic()
+    assert not shutdown.stop(stubborn + [polite])
+    # All were stopped concurrently, so the total is one deadline rather than three
+    assert time.monotonic() - start < 1.4
+    assert shutdown.killed == {0, 1, 2}
+    assert shutdown.elapsed[3] < 0.5 <= shutdown.elapsed[0]
+    assert not any(s.poll() for s in stubborn + [polite])
+    report = shutdown.report().splitlines()
+    assert report[0].endswith('killed') and not report[3].endswith('killed')
+
+
+@dataclass
+class CountingCrasher(Crasher):
+    relaunches: int = 0
+
+    def relaunched(self):
+        self.relaunches += 1
+
+
+def test_supervise_calls_relaunched():
+    crasher = CountingCrasher.start(name='crasher', status=1,
+                                    restart=RestartPolicy(RestartMode.on_failure, max_restarts=2, backoff=0.01))
+    assert supervise([crasher]) == [crasher]
+    assert crasher.relaunches == crasher.restart.count == 2
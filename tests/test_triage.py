@@ -0,0 +1,66 @@
+from mccode_plumber.manage.manager import Triage
+
+
+def test_triage_first_level_wins():
+    triage = Triage()
+    # The leftmost match is an info pattern, but error is the more severe level
+    assert triage.classify('Done, with error 42\n') == 'error'
+    assert triage.classify('[INFO] Starting the writer\n') == 'info'
+    assert triage.classify('WARNING: deprecated option\n') == 'warning'
+    assert triage.classify('critical: disk full\n') == 'critical'
+    assert triage.classify('err: anchored pattern\n') == 'error'
+    assert triage.classify('an err: not at the start\n') == 'default'
+    assert triage.classify('something to see here\n') == 'default'
+
+
+def test_triage_matches_reference():
+    from mccode_plumber.manage.triage_benchmark import SAMPLE_LINES, reference_triage
+    triage = Triage(ignore=['graphite', ':2003 failed'])
+    lines = SAMPLE_LINES + ['Traceback; warning; info\n', 'DBG message\n', 'a hint\n', 'notice\n', '']
+    for line in lines:
+        assert triage(line) == reference_triage(triage, line)
+
+
+def test_triage_level_filtering():
+    triage = Triage()
+    assert triage.level == 'info'
+    assert not triage('error\n')[0]
+    assert not triage('info\n')[0]
+    assert not triage('unclassified\n')[0]
+    assert triage('hint\n')[0]
+    assert triage('debug\n')[0]
+    assert Triage(level='warning')('info\n')[0]
+    assert not Triage(level='debug')('debug\n')[0]
+
+
+def test_triage_ignore():
+    triage = Triage(ignore=['graphite', 'a.b'])
+    assert triage('graphite: error\n') == (True, None)
+    assert triage('a.b\n') == (True, None)
+    # Keywords are literal, not regular expressions
+    assert triage('axb error\n')[0] is False
+
+
+def test_triage_custom_patterns():
+    triage = Triage(level='loud', patterns={'loud': [r'(e){3,}', r'!!'], 'quiet': [r'\.\.\.']})
+    assert triage.classify('heeeey') == 'loud'
+    assert triage.classify('wait... !!') == 'loud'
+    assert triage.classify('wait...') == 'quiet'
+    assert triage('wait...')[0]
+    triage.patterns['quiet'].append('shh')
+    triage.compile()
+    assert triage.classify('SHH') == 'quiet'
+
+
+def test_triage_without_prefilter(monkeypatch):
+    import re
+    import sys
+    from mccode_plumber.manage.triage_benchmark import SAMPLE_LINES
+    prefiltered = Triage()
+    assert prefiltered._classifier.pattern.startswith('(?=')
+    # The prefilter relies on a private module, without which every line is still classified
+    monkeypatch.delattr(re, '_parser', raising=False)
+    monkeypatch.setitem(sys.modules, 're._parser', None)
+    triage = Triage()
+    assert not triage._classifier.pattern.startswith('(?=')
+    assert [triage(line) for line in SAMPLE_LINES] == [prefiltered(line) for line in SAMPLE_LINES]